@@ -14,13 +14,80 @@ class ArgumentParser:
             args.source = "stdin"
         elif not args.source and not args.input:
             exit_with_error(Error.MissingArguments)
-        
+
         return args
 
-    def parse_args(self) -> argparse.Namespace:
+    def add_arguments(self):
         self._parser.add_argument("--source", action='store')
         self._parser.add_argument("--input", action='store')
+        self.add_common_arguments()
+        self._parser.add_argument("--profile", action='store_true')
+        self._parser.add_argument("--profile-json", action='store', metavar="FILE")
+        self._parser.add_argument("--memo-stats", action='store_true')
+        self._parser.add_argument(
+            "--trace", choices=["frames", "instructions", "ring"], default=None)
+        self._parser.add_argument("--trace-sample", type=int, default=1, metavar="N")
+        self._parser.add_argument("--trace-size", type=int, default=64, metavar="N")
+        self._parser.add_argument("--trace-file", action='store', metavar="FILE")
+
+    def add_common_arguments(self):
+        self._parser.add_argument(
+            "--engine", choices=["object", "bytecode"], default="object")
+        self._parser.add_argument(
+            "--output-buffer", type=int, default=8192, metavar="SIZE")
+        self._parser.add_argument("--load-timings", action='store_true')
+        self._parser.add_argument("--cache-dir", action='store', metavar="DIR")
+        self._parser.add_argument("--no-diagnostics", action='store_true')
+        self._parser.add_argument("--no-specialize", action='store_true')
+        self._parser.add_argument("--no-fuse", action='store_true')
+        self._parser.add_argument("--no-memoize", action='store_true')
+        self._parser.add_argument("--no-tail-calls", action='store_true')
+        self._parser.add_argument("--memo-size", type=int, default=4096, metavar="N")
+        self._parser.add_argument("--optimize", action='store_true')
+        self._parser.add_argument("--optimized-listing", action='store_true')
+        self._parser.add_argument("--max-instructions", type=int, default=None, metavar="N")
+        self._parser.add_argument("--max-call-depth", type=int, default=None, metavar="N")
+        self._parser.add_argument("--max-frame-depth", type=int, default=None, metavar="N")
+        self._parser.add_argument("--max-data-stack", type=int, default=None, metavar="N")
+        self._parser.add_argument("--max-string-chars", type=int, default=None, metavar="N")
+
+    def parse_args(self) -> argparse.Namespace:
+        self.add_arguments()
 
         args = self._parser.parse_args()
 
         return self.validate_args(args)
+
+
+class BatchArgumentParser(ArgumentParser):
+    def validate_args(self, args: argparse.Namespace):
+        if not args.source:
+            exit_with_error(Error.MissingArguments)
+
+        if not args.inputs and not args.input_dir:
+            exit_with_error(Error.MissingArguments)
+
+        return args
+
+    def add_arguments(self):
+        self._parser.add_argument("--source", action='store')
+        self.add_common_arguments()
+        self._parser.add_argument("inputs", nargs="*", metavar="INPUT")
+        self._parser.add_argument("--input-dir", action='store', metavar="DIR")
+        self._parser.add_argument("--pattern", action='store', default="*.in")
+        self._parser.add_argument("--output-dir", action='store', metavar="DIR")
+
+
+class ParallelArgumentParser(ArgumentParser):
+    def validate_args(self, args: argparse.Namespace):
+        if not args.jobs:
+            exit_with_error(Error.MissingArguments)
+
+        return args
+
+    def add_arguments(self):
+        self.add_common_arguments()
+        self._parser.add_argument("jobs", nargs="?", metavar="JOBS")
+        self._parser.add_argument("--results", action='store', default="results.jsonl")
+        self._parser.add_argument("--workers", type=int, default=None)
+        self._parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS")
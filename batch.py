@@ -0,0 +1,63 @@
+from argument_parser import BatchArgumentParser
+from interpret import load_program, execute
+from runtime import Runtime
+import glob
+import io
+import os
+import traceback
+
+
+def collect_inputs(args):
+    inputs = list(args.inputs)
+
+    if args.input_dir:
+        inputs += sorted(glob.glob(os.path.join(args.input_dir, args.pattern)))
+
+    return inputs
+
+
+def run_case(instructions, program, runtime, input):
+    stdout = io.StringIO()
+    runtime.reset(stdout)
+
+    try:
+        runtime.open_input(input)
+        execute(instructions, program, runtime)
+        code = 0
+    except SystemExit as error:
+        code = 0 if error.code is None else int(error.code)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+
+    return stdout.getvalue(), code
+
+
+def write_result(output_dir, input, stdout, code):
+    stem = os.path.splitext(os.path.basename(input))[0]
+
+    with open(os.path.join(output_dir, stem + ".out"), "w") as file:
+        file.write(stdout)
+
+    with open(os.path.join(output_dir, stem + ".rc"), "w") as file:
+        file.write(f"{code}\n")
+
+
+if __name__ == "__main__":
+    argparser = BatchArgumentParser()
+    args = argparser.parse_args()
+
+    runtime = Runtime(args.output_buffer)
+
+    instructions, program = load_program(args, runtime)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for input in collect_inputs(args):
+        stdout, code = run_case(instructions, program, runtime, input)
+
+        if args.output_dir:
+            write_result(args.output_dir, input, stdout, code)
+
+        print(f"{input}\t{code}")
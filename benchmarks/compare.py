@@ -0,0 +1,137 @@
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+from benchmarks.runner import dump_results, print_results, run
+from benchmarks.workloads import WORKLOADS
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def standard_error(result):
+    return result["stdev"] / math.sqrt(len(result["runs"]))
+
+
+def compare(baseline, current, noise, max_regression):
+    # Medians keep a single slow run from deciding the verdict. A change
+    # counts only when it is larger than both the noise floor and three
+    # standard errors of the difference, so a handful of workloads can be
+    # checked at once without noise failing the gate.
+    rows = []
+
+    for result in current:
+        base = baseline[result["workload"], result["engine"]]
+        if base["size"] != result["size"]:
+            # The generator defaults changed since the baseline was taken.
+            continue
+
+        before = statistics.median(base["runs"])
+        after = statistics.median(result["runs"])
+
+        change = (after - before) / before * 100
+        error = 3 * math.hypot(standard_error(result), standard_error(base)) / before * 100
+        margin = max(noise, error)
+
+        if change > margin:
+            verdict = "FAIL" if change > max_regression else "slower"
+        elif change < -margin:
+            verdict = "faster"
+        else:
+            verdict = "same"
+
+        rows.append({
+            "workload": result["workload"],
+            "engine": result["engine"],
+            "baseline": before,
+            "current": after,
+            "change": change,
+            "margin": margin,
+            "verdict": verdict,
+        })
+
+    return rows
+
+
+def print_comparison(rows, stream=sys.stdout):
+    print(f"{'workload':<12}{'engine':<10}{'baseline s':>12}{'current s':>12}"
+          f"{'change %':>10}{'noise %':>9}  verdict",
+          file=stream)
+
+    for row in rows:
+        print(f"{row['workload']:<12}{row['engine']:<10}{row['baseline']:>12.3f}"
+              f"{row['current']:>12.3f}{row['change']:>+10.1f}{row['margin']:>9.1f}  {row['verdict']}",
+              file=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", action="store", default=BASELINE, metavar="FILE")
+    parser.add_argument(
+        "--update", action="store_true", help="run the workloads and store them as the baseline")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="workload scale for --update")
+    parser.add_argument(
+        "--flag", action="append", default=[], metavar="FLAG",
+        help="extra interpret.py argument for --update")
+    parser.add_argument(
+        "--noise", type=float, default=5.0, metavar="PERCENT",
+        help="changes below this are never reported")
+    parser.add_argument(
+        "--max-regression", type=float, default=10.0, metavar="PERCENT",
+        help="exit with 1 when a workload slows down by more than this")
+    parser.add_argument("--json", action="store", metavar="FILE")
+    args = parser.parse_args()
+
+    if args.repeat < 2:
+        parser.error("--repeat must be at least 2 to estimate the noise")
+
+    if args.update:
+        results = run(list(WORKLOADS), ["object", "bytecode"], args.repeat, args.scale, args.flag)
+        print_results(results)
+        dump_results(results, args, args.baseline)
+        return
+
+    try:
+        with open(args.baseline) as file:
+            report = json.load(file)
+    except (OSError, ValueError) as error:
+        sys.exit(f"cannot read baseline {args.baseline}: {error}")
+
+    # Sizes, scale and interpreter flags come from the baseline, otherwise
+    # the numbers would not be comparable.
+    baseline = {(result["workload"], result["engine"]): result for result in report["results"]}
+    names = list(dict.fromkeys(
+        workload for workload, _ in baseline if workload in WORKLOADS))
+    engines = list(dict.fromkeys(engine for _, engine in baseline))
+
+    skipped = sorted({workload for workload, _ in baseline} - set(names))
+    if skipped:
+        print(f"skipped, no longer generated: {', '.join(skipped)}", file=sys.stderr)
+
+    current = [
+        result
+        for result in run(names, engines, args.repeat, report["scale"], report["flags"])
+        if (result["workload"], result["engine"]) in baseline
+    ]
+
+    rows = compare(baseline, current, args.noise, args.max_regression)
+    print_comparison(rows)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"baseline": args.baseline, "comparison": rows}, file, indent=2)
+            file.write("\n")
+
+    failed = [row for row in rows if row["verdict"] == "FAIL"]
+    if failed:
+        print(f"{len(failed)} workloads regressed by more than {args.max_regression}%",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
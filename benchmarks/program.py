@@ -0,0 +1,37 @@
+import os
+from xml.sax.saxutils import escape
+
+
+INTERPRETER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "interpret.py")
+
+
+LABEL_OPCODES = {"LABEL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "CALL", "JUMPIFEQS", "JUMPIFNEQS"}
+FRAMES = {"GF", "LF", "TF"}
+
+
+def argument(opcode, idx, token):
+    if opcode in LABEL_OPCODES and idx == 1:
+        _type, text = "label", token
+    elif opcode == "READ" and idx == 2:
+        _type, text = "type", token
+    elif token.split("@", 1)[0] in FRAMES:
+        _type, text = "var", token
+    else:
+        _type, text = token.split("@", 1)
+
+    return f'    <arg{idx} type="{_type}">{escape(text)}</arg{idx}>\n'
+
+
+def to_xml(lines):
+    # Lines use the textual IPPcode23 form, "ADD GF@x GF@x int@1".
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode23">\n']
+
+    for order, line in enumerate(lines, start=1):
+        opcode, *tokens = line.split()
+        out.append(f'  <instruction order="{order}" opcode="{opcode}">\n')
+        for idx, token in enumerate(tokens, start=1):
+            out.append(argument(opcode, idx, token))
+        out.append("  </instruction>\n")
+
+    out.append("</program>\n")
+    return "".join(out)
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.program import INTERPRETER, to_xml
+from benchmarks.workloads import WORKLOADS
+
+
+LOAD_TIME = re.compile(r"load: \d+ instructions in ([\d.]+)ms")
+
+
+class Workload:
+    def __init__(self, name, size, directory):
+        generate = WORKLOADS[name][0]
+        lines, input_text = generate(size)
+
+        self.name = name
+        self.size = size
+        self.source = os.path.join(directory, f"{name}.xml")
+        self.input = os.path.join(directory, f"{name}.in")
+
+        with open(self.source, "w") as file:
+            file.write(to_xml(lines))
+        with open(self.input, "w") as file:
+            file.write(input_text)
+
+
+def interpret(workload, engine, flags, directory):
+    # Returns wall seconds, load seconds, peak RSS in bytes and the output.
+    # wait4 gives the usage of this child alone, RUSAGE_CHILDREN would
+    # keep the peak of every run so far.
+    stdout_path = os.path.join(directory, "stdout")
+    stderr_path = os.path.join(directory, "stderr")
+
+    with open(stdout_path, "w") as stdout, open(stderr_path, "w") as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, INTERPRETER, "--source", workload.source, "--input", workload.input,
+             "--engine", engine, "--load-timings", *flags],
+            stdout=stdout, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        sys.exit(f"{workload.name} ({engine}) exited with {process.returncode}")
+
+    with open(stderr_path) as file:
+        match = LOAD_TIME.search(file.read())
+    with open(stdout_path) as file:
+        output = file.read()
+
+    load = float(match.group(1)) / 1000 if match else 0.0
+    # ru_maxrss is in kilobytes on Linux.
+    return seconds, load, usage.ru_maxrss * 1024, output
+
+
+def count_instructions(workload, directory):
+    # Counted once on the object engine without the load passes that
+    # merge or skip instructions, so every engine is measured against the
+    # same number of IPPcode23 instructions.
+    path = os.path.join(directory, "profile.json")
+    flags = ["--no-specialize", "--no-fuse", "--no-memoize", "--no-tail-calls", "--profile-json", path]
+    interpret(workload, "object", flags, directory)
+
+    with open(path) as file:
+        return json.load(file)["executed"]
+
+
+def measure(workload, engine, repeat, instructions, flags, directory):
+    runs = []
+    loads = []
+    peak = 0
+    outputs = set()
+
+    for _ in range(repeat):
+        seconds, load, rss, output = interpret(workload, engine, flags, directory)
+        runs.append(seconds)
+        loads.append(load)
+        peak = max(peak, rss)
+        outputs.add(output)
+
+    if len(outputs) != 1:
+        sys.exit(f"{workload.name} ({engine}) printed different output across runs")
+
+    mean = statistics.mean(runs)
+    load = statistics.mean(loads)
+    # Wall time also covers interpreter start up, only the part after
+    # loading is spent running instructions.
+    running = max(mean - load, 1e-9)
+
+    return {
+        "workload": workload.name,
+        "engine": engine,
+        "size": workload.size,
+        "instructions": instructions,
+        "runs": runs,
+        "mean": mean,
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "min": min(runs),
+        "load": load,
+        "peak_rss": peak,
+        "instructions_per_second": instructions / running,
+        "output": outputs.pop(),
+    }
+
+
+def run(names, engines, repeat, scale, flags):
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            workload = Workload(name, max(1, int(WORKLOADS[name][1] * scale)), directory)
+            instructions = count_instructions(workload, directory)
+
+            engine_results = [
+                measure(workload, engine, repeat, instructions, flags, directory)
+                for engine in engines
+            ]
+            if len({result["output"] for result in engine_results}) != 1:
+                sys.exit(f"{name} printed different output on different engines")
+
+            results.extend(engine_results)
+
+    for result in results:
+        del result["output"]
+
+    return results
+
+
+def print_results(results, stream=sys.stdout):
+    print(f"{'workload':<12}{'engine':<10}{'instructions':>14}{'mean s':>10}{'stdev %':>9}"
+          f"{'Minstr/s':>10}{'load ms':>10}{'RSS MB':>9}",
+          file=stream)
+
+    for result in results:
+        deviation = result["stdev"] / result["mean"] * 100
+        print(f"{result['workload']:<12}{result['engine']:<10}{result['instructions']:>14}"
+              f"{result['mean']:>10.3f}{deviation:>9.1f}"
+              f"{result['instructions_per_second'] / 1e6:>10.2f}{result['load'] * 1000:>10.1f}"
+              f"{result['peak_rss'] / 2 ** 20:>9.1f}",
+              file=stream)
+
+
+def dump_results(results, args, path):
+    report = {
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "scale": args.scale,
+        "flags": args.flag,
+        "results": results,
+    }
+
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
+
+
+def add_arguments(parser):
+    parser.add_argument("--workload", choices=list(WORKLOADS), action="append")
+    parser.add_argument("--engine", choices=["object", "bytecode"], action="append")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument(
+        "--flag", action="append", default=[], metavar="FLAG",
+        help="extra interpret.py argument, e.g. --flag=--no-fuse")
+    parser.add_argument("--json", action="store", metavar="FILE")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    results = run(
+        args.workload or list(WORKLOADS), args.engine or ["object", "bytecode"],
+        args.repeat, args.scale, args.flag)
+
+    print_results(results)
+    if args.json:
+        dump_results(results, args, args.json)
+
+
+if __name__ == "__main__":
+    main()
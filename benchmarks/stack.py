@@ -0,0 +1,109 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.program import INTERPRETER, to_xml
+
+
+# Both programs compute r = ((i + 3) * 2 - i) / 2 for i in 0..n-1 and
+# print the last r.
+def three_address(iterations):
+    return [
+        "DEFVAR GF@i",
+        "DEFVAR GF@r",
+        "DEFVAR GF@t",
+        "DEFVAR GF@c",
+        "MOVE GF@i int@0",
+        "LABEL loop",
+        "ADD GF@t GF@i int@3",
+        "MUL GF@t GF@t int@2",
+        "SUB GF@t GF@t GF@i",
+        "IDIV GF@r GF@t int@2",
+        "ADD GF@i GF@i int@1",
+        f"LT GF@c GF@i int@{iterations}",
+        "JUMPIFEQ loop GF@c bool@true",
+        "WRITE GF@r",
+    ]
+
+
+def stack(iterations):
+    return [
+        "DEFVAR GF@i",
+        "DEFVAR GF@r",
+        "MOVE GF@i int@0",
+        "LABEL loop",
+        "PUSHS GF@i",
+        "PUSHS int@3",
+        "ADDS",
+        "PUSHS int@2",
+        "MULS",
+        "PUSHS GF@i",
+        "SUBS",
+        "PUSHS int@2",
+        "IDIVS",
+        "POPS GF@r",
+        "PUSHS GF@i",
+        "PUSHS int@1",
+        "ADDS",
+        "POPS GF@i",
+        "PUSHS GF@i",
+        f"PUSHS int@{iterations}",
+        "LTS",
+        "PUSHS bool@true",
+        "JUMPIFEQS loop",
+        "WRITE GF@r",
+    ]
+
+
+PROGRAMS = {
+    "three-address": three_address,
+    "stack": stack,
+}
+
+
+def measure(path, engine, repeat):
+    times = []
+    output = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, INTERPRETER, "--source", path, "--input", os.devnull, "--engine", engine],
+            capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+
+        if result.returncode != 0:
+            sys.exit(f"{path} exited with {result.returncode}")
+        output = result.stdout
+
+    return min(times), output
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", choices=["object", "bytecode"], action="append")
+    args = parser.parse_args()
+
+    engines = args.engine or ["object", "bytecode"]
+
+    print(f"{'program':<16}{'engine':<10}{'instructions':>14}{'best s':>10}{'ns/iter':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generate in PROGRAMS.items():
+            lines = generate(args.iterations)
+            path = os.path.join(directory, f"{name}.xml")
+            with open(path, "w") as file:
+                file.write(to_xml(lines))
+
+            for engine in engines:
+                seconds, output = measure(path, engine, args.repeat)
+                print(f"{name:<16}{engine:<10}{len(lines):>14}{seconds:>10.3f}"
+                      f"{seconds / args.iterations * 1e9:>10.0f}  -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# Each generator takes a size and returns the program as textual IPPcode23
+# lines together with the text fed to READ.
+
+
+def loop(size):
+    # Counting loop summing 0..size-1.
+    return [
+        "DEFVAR GF@i",
+        "DEFVAR GF@sum",
+        "DEFVAR GF@c",
+        "MOVE GF@i int@0",
+        "MOVE GF@sum int@0",
+        "LABEL loop",
+        "ADD GF@sum GF@sum GF@i",
+        "ADD GF@i GF@i int@1",
+        f"LT GF@c GF@i int@{size}",
+        "JUMPIFEQ loop GF@c bool@true",
+        "WRITE GF@sum",
+    ], ""
+
+
+def fib(size):
+    # Naive recursion, arguments and results passed on the data stack.
+    return [
+        "DEFVAR GF@r",
+        f"PUSHS int@{size}",
+        "CALL fib",
+        "POPS GF@r",
+        "WRITE GF@r",
+        "EXIT int@0",
+        "LABEL fib",
+        "CREATEFRAME",
+        "PUSHFRAME",
+        "DEFVAR LF@n",
+        "DEFVAR LF@a",
+        "DEFVAR LF@b",
+        "POPS LF@n",
+        "LT LF@a LF@n int@2",
+        "JUMPIFEQ base LF@a bool@true",
+        "SUB LF@a LF@n int@1",
+        "PUSHS LF@a",
+        "CALL fib",
+        "POPS LF@a",
+        "SUB LF@b LF@n int@2",
+        "PUSHS LF@b",
+        "CALL fib",
+        "POPS LF@b",
+        "ADD LF@a LF@a LF@b",
+        "PUSHS LF@a",
+        "POPFRAME",
+        "RETURN",
+        "LABEL base",
+        "PUSHS LF@n",
+        "POPFRAME",
+        "RETURN",
+    ], ""
+
+
+def ackermann(size):
+    # A(2, size), which recurses about size^2 times.
+    return [
+        "DEFVAR GF@r",
+        "PUSHS int@2",
+        f"PUSHS int@{size}",
+        "CALL ack",
+        "POPS GF@r",
+        "WRITE GF@r",
+        "EXIT int@0",
+        "LABEL ack",
+        "CREATEFRAME",
+        "PUSHFRAME",
+        "DEFVAR LF@m",
+        "DEFVAR LF@n",
+        "POPS LF@n",
+        "POPS LF@m",
+        "JUMPIFNEQ m_positive LF@m int@0",
+        "ADD LF@n LF@n int@1",
+        "PUSHS LF@n",
+        "POPFRAME",
+        "RETURN",
+        "LABEL m_positive",
+        "SUB LF@m LF@m int@1",
+        "JUMPIFNEQ n_positive LF@n int@0",
+        "PUSHS LF@m",
+        "PUSHS int@1",
+        "CALL ack",
+        "POPFRAME",
+        "RETURN",
+        "LABEL n_positive",
+        "PUSHS LF@m",
+        "ADD LF@m LF@m int@1",
+        "SUB LF@n LF@n int@1",
+        "PUSHS LF@m",
+        "PUSHS LF@n",
+        "CALL ack",
+        "CALL ack",
+        "POPFRAME",
+        "RETURN",
+    ], ""
+
+
+def strings(size):
+    # Builds a string one CONCAT at a time, then rewrites every character.
+    return [
+        "DEFVAR GF@s",
+        "DEFVAR GF@i",
+        "DEFVAR GF@c",
+        "MOVE GF@s string@",
+        "MOVE GF@i int@0",
+        "LABEL build",
+        "CONCAT GF@s GF@s string@a",
+        "ADD GF@i GF@i int@1",
+        f"LT GF@c GF@i int@{size}",
+        "JUMPIFEQ build GF@c bool@true",
+        "MOVE GF@i int@0",
+        "LABEL rewrite",
+        "SETCHAR GF@s GF@i string@b",
+        "ADD GF@i GF@i int@1",
+        f"LT GF@c GF@i int@{size}",
+        "JUMPIFEQ rewrite GF@c bool@true",
+        "STRLEN GF@i GF@s",
+        "WRITE GF@i",
+    ], ""
+
+
+def stack(size):
+    # Pushes ten values and pops them back, size times.
+    lines = [
+        "DEFVAR GF@i",
+        "DEFVAR GF@x",
+        "DEFVAR GF@c",
+        "MOVE GF@i int@0",
+        "LABEL loop",
+    ]
+    lines += [f"PUSHS int@{val}" for val in range(10)]
+    lines += ["POPS GF@x"] * 10
+    lines += [
+        "ADD GF@i GF@i int@1",
+        f"LT GF@c GF@i int@{size}",
+        "JUMPIFEQ loop GF@c bool@true",
+        "WRITE GF@x",
+    ]
+
+    return lines, ""
+
+
+def io(size):
+    # Echoes size integers from the input.
+    return [
+        "DEFVAR GF@x",
+        "DEFVAR GF@t",
+        "LABEL loop",
+        "READ GF@x int",
+        "TYPE GF@t GF@x",
+        "JUMPIFEQ end GF@t string@nil",
+        "WRITE GF@x",
+        "WRITE string@\\010",
+        "JUMP loop",
+        "LABEL end",
+    ], "".join(f"{val}\n" for val in range(size))
+
+
+def tail_calls(size):
+    # Tail recursion size deep. count gets its argument in TF, sum copies
+    # it from the caller's LF before its PUSHFRAME. Both results are
+    # checked, a wrong one exits with 1. keeps leaves its frame pushed and
+    # drops pops its caller's as well, calls to them must not become
+    # tail calls.
+    return [
+        "DEFVAR GF@sum",
+        "DEFVAR GF@steps",
+        "DEFVAR GF@i",
+        "MOVE GF@sum int@0",
+        "MOVE GF@steps int@0",
+        f"MOVE GF@i int@{size}",
+        "CREATEFRAME",
+        "PUSHFRAME",
+        "DEFVAR LF@n",
+        "MOVE LF@n int@0",
+        "CALL sum",
+        "CREATEFRAME",
+        "DEFVAR TF@n",
+        f"MOVE TF@n int@{size}",
+        "CALL count",
+        f"JUMPIFNEQ wrong GF@sum int@{size * (size - 1) // 2}",
+        f"JUMPIFNEQ wrong GF@steps int@{size}",
+        "CREATEFRAME",
+        "PUSHFRAME",
+        "DEFVAR LF@x",
+        "MOVE LF@x string@outer",
+        "CALL calls_keeps",
+        "JUMPIFNEQ wrong LF@x string@outer",
+        "CREATEFRAME",
+        "DEFVAR TF@x",
+        "MOVE TF@x string@drops",
+        "CALL calls_drops",
+        "WRITE GF@sum",
+        "EXIT int@0",
+        "LABEL wrong",
+        "EXIT int@1",
+        "LABEL sum",
+        "CREATEFRAME",
+        "DEFVAR TF@n",
+        "MOVE TF@n LF@n",
+        "PUSHFRAME",
+        "JUMPIFEQ sum_done GF@i int@0",
+        "SUB GF@i GF@i int@1",
+        "ADD GF@sum GF@sum LF@n",
+        "ADD LF@n LF@n int@1",
+        "CALL sum",
+        "POPFRAME",
+        "RETURN",
+        "LABEL sum_done",
+        "POPFRAME",
+        "RETURN",
+        "LABEL count",
+        "PUSHFRAME",
+        "JUMPIFEQ count_done LF@n int@0",
+        "ADD GF@steps GF@steps int@1",
+        "CREATEFRAME",
+        "DEFVAR TF@n",
+        "SUB TF@n LF@n int@1",
+        "CALL count",
+        "POPFRAME",
+        "RETURN",
+        "LABEL count_done",
+        "POPFRAME",
+        "RETURN",
+        "LABEL calls_keeps",
+        "CALL keeps",
+        "POPFRAME",
+        "RETURN",
+        "LABEL keeps",
+        "CREATEFRAME",
+        "DEFVAR TF@x",
+        "MOVE TF@x string@keeps",
+        "PUSHFRAME",
+        "RETURN",
+        "LABEL calls_drops",
+        "CALL drops",
+        "POPFRAME",
+        "RETURN",
+        "LABEL drops",
+        "PUSHFRAME",
+        "POPFRAME",
+        "POPFRAME",
+        "JUMPIFNEQ wrong TF@x string@outer",
+        "RETURN",
+    ], ""
+
+
+def straight(size):
+    # Long code without jumps, dominated by load time.
+    return ["DEFVAR GF@x", "MOVE GF@x int@0"] + ["ADD GF@x GF@x int@1"] * size + ["WRITE GF@x"], ""
+
+
+WORKLOADS = {
+    "loop": (loop, 200000),
+    "fib": (fib, 20),
+    "ackermann": (ackermann, 150),
+    "strings": (strings, 50000),
+    "stack": (stack, 20000),
+    "io": (io, 50000),
+    "tail_calls": (tail_calls, 20000),
+    "straight": (straight, 100000),
+}
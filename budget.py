@@ -0,0 +1,134 @@
+import math
+from instruction import *
+
+
+# Limits are checked at labels, never per instruction: every LABEL becomes
+# a CHECKPOINT that jumps land on, so any loop or recursion passes one.
+# With no limit set nothing is replaced and the run loops are untouched.
+#
+# A checkpoint only adds to the instruction count, the limits themselves
+# are compared every CHECK_INTERVAL checkpoints, so a limit can be
+# overshot by that many blocks (or calls, or pushed frames per block).
+#
+# Strings are added up every STRING_SCAN_INTERVAL checks, counted in
+# characters. A CONCAT that would build a single string over the limit
+# fails before allocating it.
+#
+# The instruction count is approximate, not per basic block. Each
+# checkpoint charges the length of the code from its label up to the
+# next label or unconditional transfer (see region). An iteration that
+# leaves early through a conditional jump is over-charged for the rest
+# of that span, a loop whose exit test comes first pays for its whole
+# body on the last pass. Straight-line code before the first label is
+# never counted. Apart from that prefix --max-instructions errs on the
+# side of stopping early.
+#
+# Overhead with all limits on, best of 7 runs of the benchmarks.runner
+# workloads (object / bytecode engine): loop +25% / +38%, stack +17% /
+# +12%, strings +37% / +37% (most of it the CONCAT check), fib within
+# noise. Tight loops pay the most, the checkpoint is one more dispatch
+# per iteration.
+CHECK_INTERVAL = 16
+STRING_SCAN_INTERVAL = 64
+
+ENDS_REGION = (Jump, Return, Exit, Epilogue, TailCall)
+
+
+class Budget:
+    def __init__(self, instructions=None, call_depth=None, frame_depth=None,
+                 data_stack=None, string_chars=None):
+        unlimited = lambda limit: math.inf if limit is None else limit
+
+        self.instructions = unlimited(instructions)
+        self.call_depth = unlimited(call_depth)
+        self.frame_depth = unlimited(frame_depth)
+        self.data_stack = unlimited(data_stack)
+        self.string_chars = unlimited(string_chars)
+
+        self.reset()
+
+    def reset(self):
+        self.spent = 0
+        self.countdown = CHECK_INTERVAL
+        self.checks = 0
+
+    def apply(self, instructions, runtime):
+        labels = [
+            idx for idx, instruction in enumerate(instructions) if type(instruction) is Label
+        ]
+
+        limited = list(instructions)
+        for idx in labels:
+            limited[idx] = Checkpoint.restore(
+                (instructions[idx].args[0], self.region(instructions, idx)),
+                runtime, instructions[idx].order)
+
+        for idx, instruction in enumerate(limited):
+            if type(instruction) is Concat and self.string_chars != math.inf:
+                limited[idx] = instruction = BoundedConcat.restore(
+                    instruction.args, runtime, instruction.order)
+
+            # Both run loops step past a jump target, so pointing jumps one
+            # instruction earlier makes them run the checkpoint.
+            if "label" in instruction.operands and not isinstance(instruction, Label):
+                instruction.args = tuple(
+                    arg - 1 if kind == "label" else arg
+                    for kind, arg in zip(instruction.operands, instruction.args)
+                )
+
+        return limited
+
+    def region(self, instructions, idx):
+        end = idx + 1
+        while end < len(instructions) and type(instructions[end]) is not Label:
+            end += 1
+            if isinstance(instructions[end - 1], ENDS_REGION):
+                break
+
+        return end - idx
+
+    def check(self, call_depth, frame_depth, data_stack, held_values):
+        self.countdown = CHECK_INTERVAL
+
+        if self.spent > self.instructions:
+            exit_with_error(Error.InstructionLimitExceeded)
+
+        if call_depth > self.call_depth:
+            exit_with_error(Error.CallDepthExceeded)
+
+        if frame_depth > self.frame_depth:
+            exit_with_error(Error.FrameDepthExceeded)
+
+        if data_stack > self.data_stack:
+            exit_with_error(Error.DataStackExceeded)
+
+        self.checks += 1
+        if self.checks % STRING_SCAN_INTERVAL == 0 and self.string_chars != math.inf:
+            held = sum(
+                len(val)
+                for values in held_values()
+                for val in values
+                if type(val) is str or type(val) is StringBuffer
+            )
+            if held > self.string_chars:
+                exit_with_error(Error.StringLimitExceeded)
+
+    def check_concat(self, arg2, arg3):
+        if type(arg2) is not str and type(arg2) is not StringBuffer:
+            return
+        if type(arg3) is not str and type(arg3) is not StringBuffer:
+            return
+
+        if len(arg2) + len(arg3) > self.string_chars:
+            exit_with_error(Error.StringLimitExceeded)
+
+
+def create_budget(args):
+    limits = (
+        args.max_instructions, args.max_call_depth, args.max_frame_depth,
+        args.max_data_stack, args.max_string_chars,
+    )
+    if all(limit is None for limit in limits):
+        return None
+
+    return Budget(*limits)
@@ -0,0 +1,131 @@
+import glob
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+from instruction import InstructionFactory, Nil, Variable
+
+
+MAGIC = b"IPPC"
+
+OPCODES = {
+    instruction_class: opcode
+    for opcode, instruction_class in (
+        list(InstructionFactory.dispatch_dict.items())
+        + list(InstructionFactory.specialized_dict.items()))
+}
+
+
+def interpreter_version():
+    # Any change to the interpreter sources invalidates existing entries.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(sys.version.encode())
+
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+
+    return digest.digest()
+
+
+class ProgramCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = interpreter_version()
+        self.status = None
+
+    def path(self, source):
+        return os.path.join(self.directory, hashlib.blake2b(source, digest_size=20).hexdigest() + ".ippc")
+
+    def load(self, source, runtime):
+        try:
+            with open(self.path(source), "rb") as file:
+                data = file.read()
+        except OSError:
+            self.status = "miss"
+            return None
+
+        header = MAGIC + self.version
+        if not data.startswith(header):
+            self.status = "stale"
+            return None
+
+        checksum, payload = data[len(header):len(header) + 16], data[len(header) + 16:]
+        if hashlib.blake2b(payload, digest_size=16).digest() != checksum:
+            self.status = "corrupt"
+            return None
+
+        try:
+            global_names, local_names, records = marshal.loads(payload)
+            instructions = [
+                InstructionFactory.restore_instruction(
+                    opcode, self.decode(opcode, args), runtime, order)
+                for opcode, order, args in records
+            ]
+        except (EOFError, ValueError, TypeError, KeyError, IndexError):
+            self.status = "corrupt"
+            return None
+
+        runtime.layouts["GF"].restore(global_names)
+        runtime.layouts["LF"].restore(local_names)
+
+        self.status = "hit"
+        return instructions
+
+    def store(self, source, instructions, runtime):
+        records = [
+            (OPCODES[type(instruction)], instruction.order, self.encode(instruction))
+            for instruction in instructions
+        ]
+        payload = marshal.dumps((
+            runtime.layouts["GF"].names,
+            runtime.layouts["LF"].names,
+            records,
+        ))
+
+        # Entries are written to a temporary file and renamed into place, so
+        # concurrent runs never see a half-written entry.
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(MAGIC + self.version)
+                file.write(hashlib.blake2b(payload, digest_size=16).digest())
+                file.write(payload)
+            os.replace(temp_path, self.path(source))
+        except OSError:
+            os.unlink(temp_path)
+
+    def encode(self, instruction):
+        args = []
+        for kind, arg in zip(instruction.operands, instruction.args):
+            if type(arg) is Variable:
+                arg = tuple(arg)
+            elif kind == "symbol":
+                arg = () if type(arg) is Nil else (arg,)
+            args.append(arg)
+
+        return tuple(args)
+
+    def decode(self, opcode, args):
+        instruction_class = InstructionFactory.dispatch_dict[opcode]
+        if len(args) != len(instruction_class.operands):
+            raise ValueError(opcode)
+
+        decoded = []
+        for kind, arg in zip(instruction_class.operands, args):
+            if kind == "var" or (kind == "symbol" and len(arg) == 3):
+                arg = Variable(*arg)
+            elif kind == "symbol":
+                arg = arg[0] if arg else Nil()
+            decoded.append(arg)
+
+        return tuple(decoded)
+
+    def report(self, stream):
+        print(f"cache: {self.status}", file=stream)
@@ -0,0 +1,87 @@
+from instruction import InstructionFactory, Label, Variable
+
+
+OPCODES = list(InstructionFactory.dispatch_dict) + list(InstructionFactory.specialized_dict)
+
+GF, LF, TF, CONSTANTS = range(4)
+FRAME_IDS = {"GF": GF, "LF": LF, "TF": TF}
+
+
+class Program:
+    def __init__(self):
+        self.code = []
+        self.operands = []
+        self.orders = []
+        self.constants = []
+
+    def __len__(self):
+        return len(self.code)
+
+
+class Compiler:
+    opcode_of = {
+        instruction_class: opcode
+        for opcode, instruction_class in enumerate(
+            list(InstructionFactory.dispatch_dict.values())
+            + list(InstructionFactory.specialized_dict.values()))
+    }
+
+    def __init__(self):
+        self.program = Program()
+        self.lowerers = {
+            "var": self.lower_var,
+            "symbol": self.lower_symbol,
+            "type": self.lower_type,
+            "label": self.lower_label,
+            "const": self.lower_const,
+            "vars": self.lower_vars,
+            "symbols": self.lower_symbols,
+        }
+
+    def compile(self, instructions):
+        for instruction in instructions:
+            self.program.code.append(self.opcode_of[type(instruction)])
+            self.program.operands.append(self.lower(instruction))
+            self.program.orders.append(instruction.order)
+
+        return self.program
+
+    def lower(self, instruction):
+        if isinstance(instruction, Label):
+            return instruction.args
+
+        return tuple(
+            self.lowerers[kind](arg)
+            for kind, arg in zip(instruction.operands, instruction.args)
+        )
+
+    def lower_var(self, arg):
+        return FRAME_IDS[arg.frame], arg.slot
+
+    def lower_symbol(self, arg):
+        if type(arg) is Variable:
+            return self.lower_var(arg)
+
+        self.program.constants.append(arg)
+        return CONSTANTS, len(self.program.constants) - 1
+
+    def lower_type(self, arg):
+        return arg
+
+    def lower_const(self, arg):
+        # Specialized handlers take their constant operand as is.
+        return arg
+
+    def lower_vars(self, arg):
+        return tuple(self.lower_var(var) for var in arg)
+
+    def lower_symbols(self, arg):
+        return tuple(self.lower_symbol(symbol) for symbol in arg)
+
+    def lower_label(self, arg):
+        # Jumps land directly on the instruction after the label.
+        return arg + 1
+
+
+def compile_program(instructions):
+    return Compiler().compile(instructions)
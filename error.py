@@ -14,6 +14,12 @@ class Error(IntEnum):
     MissingValue = 56
     InvalidOperandValue = 57
     InvalidStringOperation = 58
+    InstructionLimitExceeded = 60
+    TimeLimitExceeded = 61
+    CallDepthExceeded = 62
+    FrameDepthExceeded = 63
+    DataStackExceeded = 64
+    StringLimitExceeded = 65
 
 
 def exit_with_error(error_code):
@@ -1,82 +1,132 @@
 import sys
 from error import exit_with_error, Error
 from collections import deque
+from string_buffer import StringBuffer
 
 
-class Frame:
+class Undefined:
     def __init__(self):
-        self.collection = {}
+        pass
 
-    def __getitem__(self, key):
-        if key not in self.collection:
-            exit_with_error(Error.InvalidVariable)
 
-        val = self.collection[key]
+class FrameLayout:
+    def __init__(self):
+        self.slots = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+
+        return self.slots[name]
+
+    def restore(self, names):
+        self.names = list(names)
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+
+
+class Frame:
+    def __init__(self, layout):
+        self.layout = layout
+        self.collection = [Undefined] * len(layout)
+
+    def __getitem__(self, slot):
+        val = self.collection[slot]
+
+        if val is Undefined:
+            exit_with_error(Error.InvalidVariable)
 
         if val is None:
             exit_with_error(Error.MissingValue)
 
+        if type(val) is StringBuffer:
+            return str(val)
+
         return val
 
-    def __setitem__(self, key, value):
-        self.collection[key] = value
+    def __setitem__(self, slot, value):
+        self.collection[slot] = value
+
+    def raw(self, slot):
+        val = self.collection[slot]
+
+        if val is Undefined:
+            exit_with_error(Error.InvalidVariable)
+
+        if val is None:
+            exit_with_error(Error.MissingValue)
+
+        return val
 
     def __repr__(self) -> str:
-        return str(self.collection)
+        return str({
+            name: val
+            for name, val in zip(self.layout.names, self.collection)
+            if val is not Undefined
+        })
 
-    def __contains__(self, key):
-        return key in self.collection
+    def __contains__(self, slot):
+        return self.collection[slot] is not Undefined
 
-    def get(self, key, default=None):
-        return self.collection.get(key, default)
+    def get(self, slot, default=None):
+        # Raw like raw(), without its checks.
+        val = self.collection[slot]
 
-    def update(self, name, value):
-        if name not in self.collection:
+        if val is Undefined:
+            return default
+
+        return val
+
+    def update(self, slot, value):
+        if self.collection[slot] is Undefined:
             exit_with_error(Error.InvalidVariable)
 
-        self.collection[name] = value
+        self.collection[slot] = value
 
 
 class LocalFrame:
     def __init__(self):
         self.collection = deque()
 
-    def __getitem__(self, key):
+    def __getitem__(self, slot):
         if not self.collection:
             exit_with_error(Error.InvalidFrame)
 
-        if key not in self.collection[-1]:
-            exit_with_error(Error.InvalidVariable)
-
-        val = self.collection[-1][key]
+        return self.collection[-1][slot]
 
-        if val is None:
-            exit_with_error(Error.MissingValue)
+    def raw(self, slot):
+        if not self.collection:
+            exit_with_error(Error.InvalidFrame)
 
-        return val
+        return self.collection[-1].raw(slot)
 
-    def __setitem__(self, key, value):
+    def __setitem__(self, slot, value):
         if not self.collection:
             exit_with_error(Error.InvalidFrame)
-        self.collection[-1][key] = value
+        self.collection[-1][slot] = value
 
-    def __contains__(self, key):
+    def __repr__(self) -> str:
+        return str(list(self.collection))
+
+    def __contains__(self, slot):
         if not self.collection:
             exit_with_error(Error.InvalidFrame)
-        return key in self.collection[-1]
+        return slot in self.collection[-1]
 
-    def get(self, key, default=None):
+    def get(self, slot, default=None):
         if not self.collection:
             exit_with_error(Error.InvalidFrame)
-        return self.collection[-1].get(key, default)
+        return self.collection[-1].get(slot, default)
 
-    def update(self, name, value):
+    def update(self, slot, value):
         if not self.collection:
             exit_with_error(Error.InvalidFrame)
-        if name not in self.collection[-1]:
-            exit_with_error(Error.InvalidVariable)
 
-        self.collection[-1][name] = value
+        self.collection[-1].update(slot, value)
 
     def pop(self):
         return self.collection.pop()
@@ -86,9 +136,9 @@ class LocalFrame:
 
 
 class FrameHolder:
-    def __init__(self):
+    def __init__(self, layouts):
         self.collection = {
-            "GF": Frame(),
+            "GF": Frame(layouts["GF"]),
             "LF": LocalFrame(),
             "TF": None,
         }
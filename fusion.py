@@ -0,0 +1,111 @@
+from instruction import *
+
+
+class Fuser:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.counts = {}
+
+    def fuse(self, instructions):
+        # A superinstruction only replaces the first instruction of its
+        # sequence, so every index, label and return address stays valid.
+        patterns = {
+            Add: self.add_jump,
+            AddVarVar: self.add_jump,
+            AddVarConst: self.add_jump,
+            CreateFrame: self.prologue,
+            PopFrame: self.epilogue,
+            Pushs: self.pushs_call,
+        }
+        fused = list(instructions)
+
+        idx = 0
+        while idx < len(instructions):
+            pattern = patterns.get(type(instructions[idx]))
+            match = pattern(instructions, idx) if pattern is not None else None
+            if match is None:
+                idx += 1
+                continue
+
+            fused_class, args, size = match
+            self.counts[fused_class] = self.counts.get(fused_class, 0) + 1
+            fused[idx] = fused_class.restore(args, self.runtime, instructions[idx].order)
+
+            # The rest of a matched sequence is only entered by a return
+            # address, where running the originals one by one is correct.
+            idx += size
+
+        return fused
+
+    def add_jump(self, instructions, idx):
+        if idx + 1 >= len(instructions):
+            return None
+
+        add, jump = instructions[idx], instructions[idx + 1]
+        if not isinstance(add, Add) or not isinstance(jump, JumpIfNeq):
+            return None
+
+        target, arg2, arg3 = add.args
+        if type(arg2) is not Variable or (type(arg3) is not int and type(arg3) is not float):
+            return None
+
+        label, jump2, jump3 = jump.args
+        if jump3 == target and type(jump2) is not Variable:
+            jump2, jump3 = jump3, jump2
+        if jump2 != target:
+            return None
+
+        return AddJumpIfNeq, (target, arg2, arg3, label, jump3), 2
+
+    def prologue(self, instructions, idx):
+        if idx + 1 >= len(instructions):
+            return None
+
+        if type(instructions[idx]) is not CreateFrame or type(instructions[idx + 1]) is not PushFrame:
+            return None
+
+        # A repeated DEFVAR has to fail, so it ends the sequence.
+        variables = []
+        for pos in range(idx + 2, len(instructions)):
+            instruction = instructions[pos]
+            if type(instruction) is not DefVar:
+                break
+
+            var = instruction.args[0]
+            if var.frame != "LF" or var in variables:
+                break
+            variables.append(var)
+
+        return Prologue, (tuple(variables),), len(variables) + 2
+
+    def epilogue(self, instructions, idx):
+        if idx + 1 >= len(instructions):
+            return None
+
+        if type(instructions[idx]) is not PopFrame or type(instructions[idx + 1]) is not Return:
+            return None
+
+        return Epilogue, (), 2
+
+    def pushs_call(self, instructions, idx):
+        end = idx
+        while end < len(instructions) and type(instructions[end]) is Pushs:
+            end += 1
+
+        if end == idx or end == len(instructions) or type(instructions[end]) is not Call:
+            return None
+
+        symbols = tuple(instruction.args[0] for instruction in instructions[idx:end])
+        return PushsCall, (symbols, instructions[end].args[0]), end - idx + 1
+
+    def report(self, stream):
+        names = {
+            instruction_class: opcode
+            for opcode, instruction_class in InstructionFactory.specialized_dict.items()
+        }
+
+        fusions = ", ".join(
+            f"{names[fused_class]} {count}" for fused_class, count in self.counts.items())
+        print(f"fused: {sum(self.counts.values())} sequences"
+              + (f" ({fusions})" if fusions else ""),
+              file=stream)
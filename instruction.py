@@ -1,8 +1,10 @@
 import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
 import sys
+from typing import NamedTuple
 from error import Error, exit_with_error
-from frame import Frame
+from frame import Frame, Undefined
+from string_buffer import StringBuffer
 import re
 
 
@@ -12,25 +14,84 @@ class Nil:
 
     def __str__(self):
         return "nil"
-    
+
     def __eq__(self, __value: object) -> bool:
         return type(__value) is Nil
 
-class Undefined:
-    def __init__(self):
-        pass
+class Variable(NamedTuple):
+    frame: str
+    name: str
+    slot: int
+
+
+def float_operands(arg2, arg3):
+    # Arithmetic checks for int first, so this is only reached off the
+    # int path.
+    if type(arg2) is not float or type(arg3) is not float:
+        exit_with_error(Error.InvalidOperands)
+
+
+def format_float(val):
+    # Matches printf("%a"): float.hex() pads the mantissa with zeros.
+    mantissa, sep, exponent = val.hex().partition("p")
+    if not sep:
+        return mantissa
+
+    if "." in mantissa:
+        mantissa = mantissa.rstrip("0").rstrip(".")
+
+    return f"{mantissa}p{exponent}"
 
 
 class Instruction(ABC):
+    operands = ()
+    order = None
 
     def __init__(self, element, runtime):
-        self.element = element
         self.runtime = runtime
+        self.args = self.decode(element)
+
+    @classmethod
+    def restore(cls, args, runtime, order=None):
+        instruction = cls.__new__(cls)
+        instruction.runtime = runtime
+        instruction.args = args
+        instruction.order = order
+        return instruction
 
     @abstractmethod
     def execute(self):
         pass
 
+    def decode(self, element):
+        if len(element) != len(self.operands):
+            exit_with_error(Error.InvalidXmlStructure)
+
+        args = []
+        for idx, kind in enumerate(self.operands, start=1):
+            arg = element.find(f"arg{idx}")
+            if arg is None:
+                exit_with_error(Error.InvalidXmlStructure)
+
+            args.append(getattr(self, f"parse_{kind}")(arg))
+
+        return tuple(args)
+
+    def link(self, labels):
+        if "label" not in self.operands:
+            return
+
+        self.args = tuple(
+            self.resolve_label(arg, labels) if kind == "label" else arg
+            for kind, arg in zip(self.operands, self.args)
+        )
+
+    def resolve_label(self, label, labels):
+        if label not in labels:
+            exit_with_error(Error.InvalidSemantics)
+
+        return labels[label]
+
     def parse_symbol(self, element):
         if element.attrib.get("type") == "var":
             return self.parse_var(element)
@@ -42,6 +103,13 @@ class Instruction(ABC):
                 exit_with_error(Error.InvalidXmlStructure)
             return x
 
+        if element.attrib.get("type") == "float":
+            try:
+                x = float.fromhex(element.text)
+            except:
+                exit_with_error(Error.InvalidXmlStructure)
+            return x
+
         if element.attrib.get("type") == "bool":
             if element.text == "false":
                 return False
@@ -60,11 +128,13 @@ class Instruction(ABC):
         if element.attrib.get("type") == "nil":
             return Nil()
 
+        exit_with_error(Error.InvalidXmlStructure)
+
     def parse_type(self, element):
         if element.attrib.get("type") != "type":
             exit_with_error(Error.InvalidXmlStructure)
 
-        if element.text not in ["int", "bool", "string", "nil"]:
+        if element.text not in ["int", "bool", "string", "nil", "float"]:
             exit_with_error(Error.InvalidOperands)
 
         return element.text
@@ -77,57 +147,40 @@ class Instruction(ABC):
         if splittext[0] not in self.runtime.frames:
             exit_with_error(Error.InvalidFrame)
 
-        return splittext[0], splittext[1]
+        slot = self.runtime.layouts[splittext[0]].slot(splittext[1])
+
+        return Variable(splittext[0], splittext[1], slot)
 
     def parse_label(self, element):
         return element.text
 
 
 class Move(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
+    operands = ("var", "symbol")
 
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
+    def execute(self):
+        target, source = self.args
 
-        if type(arg2) is tuple:
-            source_frame, source_name = arg2
-            self.runtime.frames[target_frame].update(
-                target_name, self.runtime.frames[source_frame][source_name])
+        if type(source) is Variable:
+            self.runtime.frames[target.frame].update(
+                target.slot, self.runtime.frames[source.frame][source.slot])
         else:
-            self.runtime.frames[target_frame].update(target_name, arg2)
+            self.runtime.frames[target.frame].update(target.slot, source)
 
 
 class CreateFrame(Instruction):
     def execute(self):
-        if len(self.element) != 0:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        self.runtime.frames["TF"] = Frame()
+        self.runtime.frames["TF"] = Frame(self.runtime.layouts["TF"])
 
 
 class PushFrame(Instruction):
     def execute(self):
-        if len(self.element) != 0:
-            exit_with_error(Error.InvalidXmlStructure)
-
         self.runtime.frames["LF"].append(self.runtime.frames["TF"])
         self.runtime.frames["TF"] = None
 
 
 class PopFrame(Instruction):
     def execute(self):
-        if len(self.element) != 0:
-            exit_with_error(Error.InvalidXmlStructure)
-
         try:
             self.runtime.frames["TF"] = self.runtime.frames["LF"].pop()
         except:
@@ -135,43 +188,27 @@ class PopFrame(Instruction):
 
 
 class DefVar(Instruction):
-    def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("var",)
 
-        arg1 = self.element.find("arg1")
-        if arg1 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-        source_frame, source_name = self.parse_var(arg1)
+    def execute(self):
+        source_frame, _, source_slot = self.args[0]
 
-        if source_name not in self.runtime.frames[source_frame]:
-            self.runtime.frames[source_frame][source_name] = None
+        if source_slot not in self.runtime.frames[source_frame]:
+            self.runtime.frames[source_frame][source_slot] = None
         else:
             exit_with_error(Error.InvalidSemantics)
 
 
 class Call(Instruction):
-    def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("label",)
 
+    def execute(self):
         self.runtime.call_stack.append(self.runtime.instruction_pointer)
-
-        label_name = self.parse_label(self.element.find("arg1"))
-
-        for label in self.runtime.labels:
-            if label == label_name:
-                self.runtime.instruction_pointer = self.runtime.labels[label]
-                return
-
-        exit_with_error(Error.InvalidSemantics)
+        self.runtime.instruction_pointer = self.args[0]
 
 
 class Return(Instruction):
     def execute(self):
-        if len(self.element) != 0:
-            exit_with_error(Error.InvalidXmlStructure)
-
         if len(self.runtime.call_stack) == 0:
             sys.exit(Error.MissingValue)
         else:
@@ -179,15 +216,13 @@ class Return(Instruction):
 
 
 class Pushs(Instruction):
-    def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("symbol",)
 
-        arg = self.element.find("arg1")
-        arg = self.parse_symbol(arg)
+    def execute(self):
+        arg = self.args[0]
 
-        if type(arg) is tuple:
-            val = self.runtime.frames[arg[0]][arg[1]]
+        if type(arg) is Variable:
+            val = self.runtime.frames[arg.frame][arg.slot]
         else:
             val = arg
 
@@ -195,156 +230,150 @@ class Pushs(Instruction):
 
 
 class Pops(Instruction):
-    def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
-        arg = self.element.find("arg1")
+    operands = ("var",)
 
-        target_frame, target_name = self.parse_var(arg)
+    def execute(self):
+        target = self.args[0]
 
         if len(self.runtime.data_stack) == 0:
             exit_with_error(Error.MissingValue)
 
-        self.runtime.frames[target_frame].update(
-            target_name, self.runtime.data_stack.pop())
+        self.runtime.frames[target.frame].update(
+            target.slot, self.runtime.data_stack.pop())
 
 
 class Add(Instruction):
+    operands = ("var", "symbol", "symbol")
+
     def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
+        target, arg2, arg3 = self.args
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        target_frame, target_name = self.parse_var(arg1)
+        if not type(arg2) is int or not type(arg3) is int:
+            float_operands(arg2, arg3)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 + arg3)
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+class Sub(Instruction):
+    operands = ("var", "symbol", "symbol")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if not type(arg2) is int or not type(arg3) is int:
-            exit_with_error(Error.InvalidOperands)
+            float_operands(arg2, arg3)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 + arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 - arg3)
 
 
-class Sub(Instruction):
+class Mul(Instruction):
+    operands = ("var", "symbol", "symbol")
+
     def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
+        target, arg2, arg3 = self.args
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+        if not type(arg2) is int or not type(arg3) is int:
+            float_operands(arg2, arg3)
 
-        target_frame, target_name = self.parse_var(arg1)
+        self.runtime.frames[target.frame].update(target.slot, arg2 * arg3)
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+class Idiv(Instruction):
+    operands = ("var", "symbol", "symbol")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if not type(arg2) is int or not type(arg3) is int:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 - arg3)
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+        self.runtime.frames[target.frame].update(target.slot, arg2 // arg3)
 
 
-class Mul(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
+class Div(Instruction):
+    operands = ("var", "symbol", "symbol")
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        target_frame, target_name = self.parse_var(arg1)
+        float_operands(arg2, arg3)
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+        self.runtime.frames[target.frame].update(target.slot, arg2 / arg3)
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
 
-        if not type(arg2) is int or not type(arg3) is int:
-            exit_with_error(Error.InvalidOperands)
+class Int2Float(Instruction):
+    operands = ("var", "symbol")
 
-        self.runtime.frames[target_frame].update(target_name, arg2 * arg3)
+    def execute(self):
+        target, arg2 = self.args
 
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-class Idiv(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
+        if type(arg2) is not int:
+            exit_with_error(Error.InvalidOperands)
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+        self.runtime.frames[target.frame].update(target.slot, float(arg2))
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
 
-        target_frame, target_name = self.parse_var(arg1)
+class Float2Int(Instruction):
+    operands = ("var", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if not type(arg2) is int or not type(arg3) is int:
+        if type(arg2) is not float:
             exit_with_error(Error.InvalidOperands)
 
-        if arg3 == 0:
+        try:
+            self.runtime.frames[target.frame].update(target.slot, int(arg2))
+        except (OverflowError, ValueError):
             exit_with_error(Error.InvalidOperandValue)
-        self.runtime.frames[target_frame].update(target_name, arg2 // arg3)
 
 
 class Lt(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("var", "symbol", "symbol")
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not type(arg3):
             exit_with_error(Error.InvalidOperands)
@@ -352,30 +381,19 @@ class Lt(Instruction):
         if type(arg2) is Nil or type(arg2) is Nil:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 < arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 < arg3)
 
 
 class Gt(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+    operands = ("var", "symbol", "symbol")
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not type(arg3):
             exit_with_error(Error.InvalidOperands)
@@ -383,30 +401,19 @@ class Gt(Instruction):
         if type(arg2) is Nil or type(arg2) is Nil:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 > arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 > arg3)
 
 
 class Eq(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
+    operands = ("var", "symbol", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not type(arg3):
             if type(arg2) is Nil or type(arg3) is Nil:
@@ -414,295 +421,182 @@ class Eq(Instruction):
             else:
                 exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 == arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 == arg3)
 
 
 class And(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("var", "symbol", "symbol")
 
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not bool or type(arg3) is not bool:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 and arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 and arg3)
 
 
 class Or(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
+    operands = ("var", "symbol", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not bool or type(arg3) is not bool:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 or arg3)
+        self.runtime.frames[target.frame].update(target.slot, arg2 or arg3)
 
 
 class Not(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
+    operands = ("var", "symbol")
 
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
+    def execute(self):
+        target, arg2 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
         if type(arg2) is not bool:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, not arg2)
+        self.runtime.frames[target.frame].update(target.slot, not arg2)
 
 
 class Int2Char(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
+    operands = ("var", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
+    def execute(self):
+        target, arg2 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
         if type(arg2) is not int:
             exit_with_error(Error.InvalidOperands)
 
         try:
-            self.runtime.frames[target_frame].update(target_name, chr(arg2))
+            self.runtime.frames[target.frame].update(target.slot, chr(arg2))
         except ValueError:
             exit_with_error(Error.InvalidStringOperation)
 
 
 class Stri2Int(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("var", "symbol", "symbol")
 
-        target_frame, target_name = self.parse_var(arg1)
-
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) is not str or type(arg3) is not int:
             exit_with_error(Error.InvalidOperands)
-        
+
         if arg3 >= len(arg2) or arg3 < 0:
             exit_with_error(Error.InvalidStringOperation)
 
-        self.runtime.frames[target_frame].update(target_name, ord(arg2[arg3]))
+        self.runtime.frames[target.frame].update(target.slot, ord(arg2[arg3]))
 
 
 class Read(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-        _type = self.parse_type(arg2)
-
-        val = self.runtime.input.readline()
-
-        if val == "":
-            val = Nil()
-        else:
-            val = val.rstrip('\n')
-
-            if val == "" and _type != "string":
-                val = Nil()
-            
-            elif _type == "int":
-                try:
-                    val = int(val, 0)
-                except ValueError:
-                    val = Nil()
-                    
-            elif _type == "bool":
-                if val.lower() == "true":
-                    val = True
-                else:
-                    val = False
-
-            elif _type == "string":
-                if val == "true\n":
-                    val = True
-
-            elif _type == "nil":
-                exit_with_error(Error.InvalidOperands)
-
-        self.runtime.frames[target_frame].update(target_name, val)
+    operands = ("var", "type")
 
-
-class Write(Instruction):
     def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
+        target, _type = self.args
 
-        arg1 = self.element.find("arg1")
+        self.runtime.frames[target.frame].update(
+            target.slot, self.runtime.read(_type))
 
-        if arg1 is None:
-            exit_with_error(Error.InvalidXmlStructure)
 
-        val = self.parse_symbol(arg1)
+class Write(Instruction):
+    operands = ("symbol",)
 
-        if type(val) is tuple:
-            val = self.runtime.frames[val[0]][val[1]]
+    def execute(self):
+        val = self.args[0]
 
-        if type(val) is Nil:
-            val = ""
-        if type(val) is bool:
-            val = str(val).lower()
+        if type(val) is Variable:
+            val = self.runtime.frames[val.frame][val.slot]
 
-        print(val, end="")
+        self.runtime.write(val)
 
 
 class Concat(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+    operands = ("var", "symbol", "symbol")
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    def execute(self):
+        target, arg2, arg3 = self.args
+        appending = arg2 == target
 
-        target_frame, target_name = self.parse_var(arg1)
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame].raw(arg2.slot)
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is StringBuffer and type(arg3) is str:
+            if appending:
+                arg2.append(arg3)
+                return
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+            arg2 = str(arg2)
 
         if type(arg2) is not str or type(arg3) is not str:
             exit_with_error(Error.InvalidOperands)
 
-        self.runtime.frames[target_frame].update(target_name, arg2 + arg3)
-
-
-class Strlen(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
+        # Appending onto the same variable switches it to a buffer, so a
+        # loop building a string stays linear.
+        if appending:
+            val = StringBuffer(arg2)
+            val.append(arg3)
+        else:
+            val = arg2 + arg3
 
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
+        self.runtime.frames[target.frame].update(target.slot, val)
 
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
 
-        target_frame, target_name = self.parse_var(arg1)
+class Strlen(Instruction):
+    operands = ("var", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
+    def execute(self):
+        target, arg2 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame].raw(arg2.slot)
 
-        if type(arg2) is not str:
+        if type(arg2) is not str and type(arg2) is not StringBuffer:
             exit_with_error(Error.InvalidOperands)
-        
 
-        self.runtime.frames[target_frame].update(target_name, len(arg2))
 
+        self.runtime.frames[target.frame].update(target.slot, len(arg2))
 
-class GetChar(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
+class GetChar(Instruction):
+    operands = ("var", "symbol", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame].raw(arg2.slot)
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        if type(arg2) is not str or type(arg3) is not int:
+        if (type(arg2) is not str and type(arg2) is not StringBuffer) or type(arg3) is not int:
             exit_with_error(Error.InvalidOperands)
 
         if arg3 >= len(arg2) or arg3 < 0:
@@ -711,132 +605,97 @@ class GetChar(Instruction):
         if arg2[arg3] == "":
             exit_with_error(Error.InvalidStringOperation)
 
-        self.runtime.frames[target_frame].update(target_name, arg2[arg3])
+        self.runtime.frames[target.frame].update(target.slot, arg2[arg3])
 
 
 class SetChar(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
+    operands = ("var", "symbol", "symbol")
 
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        target_frame, target_name = self.parse_var(arg1)
-        val = self.runtime.frames[target_frame][target_name]
+    def execute(self):
+        target, arg2, arg3 = self.args
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+        val = self.runtime.frames[target.frame].raw(target.slot)
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]][0]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
-        if type(val) is not str or type(arg2) is not int or type(arg3) is not str:
+        if (type(val) is not str and type(val) is not StringBuffer) or type(arg2) is not int or type(arg3) is not str:
             exit_with_error(Error.InvalidOperands)
 
         if arg2 >= len(val) or arg2 < 0:
             exit_with_error(Error.InvalidStringOperation)
 
-        if arg3 == "" or val == "":
+        if arg3 == "" or len(val) == 0:
             exit_with_error(Error.InvalidStringOperation)
 
-        val = val[:arg2] + arg3[0] + val[arg2 + 1:]
+        # The character is set in place, the buffer is only built once.
+        if type(val) is str:
+            val = StringBuffer(val)
+            self.runtime.frames[target.frame].update(target.slot, val)
 
-        self.runtime.frames[target_frame].update(target_name, val)
+        val.setchar(arg2, arg3[0])
 
 
 class Type(Instruction):
-    def execute(self):
-        if len(self.element) != 2:
-            exit_with_error(Error.InvalidXmlStructure)
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-
-        if arg1 is None or arg2 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("var", "symbol")
 
-        target_frame, target_name = self.parse_var(arg1)
+    def execute(self):
+        target, arg2 = self.args
 
-        arg2 = self.parse_symbol(arg2)
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame].get(arg2.slot, Undefined)
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]].get(arg2[1], Undefined)
-        
         if arg2 is Undefined:
             exit_with_error(Error.InvalidVariable)
-        
+
         if type(arg2) is int:
             val = "int"
         if type(arg2) is bool:
             val = "bool"
-        if type(arg2) is str:
+        if type(arg2) is str or type(arg2) is StringBuffer:
                 val = "string"
+        if type(arg2) is float:
+            val = "float"
         if type(arg2) is Nil:
             val = "nil"
 
         if arg2 is None:
             val = ""
 
-        self.runtime.frames[target_frame].update(target_name, val)
+        self.runtime.frames[target.frame].update(target.slot, val)
 
 
 class Label(Instruction):
-    def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
-        pass
+    operands = ("label",)
 
+    def link(self, labels):
+        pass
 
-class Jump(Instruction):
     def execute(self):
-        if len(self.element) != 1:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-
-        if arg1 is None:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.parse_label(arg1)
-
-        if arg1 not in self.runtime.labels:
-            exit_with_error(Error.InvalidSemantics)
+        pass
 
-        self.runtime.instruction_pointer = self.runtime.labels[arg1]
 
+class Jump(Instruction):
+    operands = ("label",)
 
-class JumpIfEq(Instruction):
     def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+        self.runtime.instruction_pointer = self.args[0]
 
-        arg1 = self.parse_label(arg1)
 
-        if arg1 not in self.runtime.labels:
-            exit_with_error(Error.InvalidSemantics)
+class JumpIfEq(Instruction):
+    operands = ("label", "symbol", "symbol")
 
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        arg1, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         if type(arg2) != type(arg3):
             if type(arg2) is Nil or type(arg3) is Nil:
@@ -845,34 +704,20 @@ class JumpIfEq(Instruction):
                 exit_with_error(Error.InvalidOperands)
 
         if arg2 == arg3:
-            self.runtime.instruction_pointer = self.runtime.labels[arg1]
+            self.runtime.instruction_pointer = arg1
 
 
 class JumpIfNeq(Instruction):
-    def execute(self):
-        if len(self.element) != 3:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        arg1 = self.element.find("arg1")
-        arg2 = self.element.find("arg2")
-        arg3 = self.element.find("arg3")
-
-        if arg1 is None or arg2 is None or arg3 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    operands = ("label", "symbol", "symbol")
 
-        arg1 = self.parse_label(arg1)
-
-        if arg1 not in self.runtime.labels:
-            exit_with_error(Error.InvalidSemantics)
-
-        arg2 = self.parse_symbol(arg2)
-        arg3 = self.parse_symbol(arg3)
+    def execute(self):
+        arg1, arg2, arg3 = self.args
 
-        if type(arg2) is tuple:
-            arg2 = self.runtime.frames[arg2[0]][arg2[1]]
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame][arg2.slot]
 
-        if type(arg3) is tuple:
-            arg3 = self.runtime.frames[arg3[0]][arg3[1]]
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame][arg3.slot]
 
         # if type(arg2) is Nil or type(arg3) is Nil:
         #     if not (type(arg2) is Nil and type(arg3) is Nil):
@@ -885,19 +730,17 @@ class JumpIfNeq(Instruction):
                 exit_with_error(Error.InvalidOperands)
 
         if arg2 != arg3:
-            self.runtime.instruction_pointer = self.runtime.labels[arg1]
+            self.runtime.instruction_pointer = arg1
 
 
 class Exit(Instruction):
-    def execute(self):
-        arg1 = self.element.find("arg1")
+    operands = ("symbol",)
 
-        if arg1 is None:
-            exit_with_error(Error.InvalidXmlStructure)
+    def execute(self):
+        arg1 = self.args[0]
 
-        arg1 = self.parse_symbol(arg1)
-        if type(arg1) is tuple:
-            arg1 = self.runtime.frames[arg1[0]][arg1[1]]
+        if type(arg1) is Variable:
+            arg1 = self.runtime.frames[arg1.frame][arg1.slot]
 
         if type(arg1) is not int:
             exit_with_error(Error.InvalidOperands)
@@ -909,19 +752,646 @@ class Exit(Instruction):
 
 
 class DPrint(Instruction):
+    operands = ("symbol",)
+
     def execute(self):
-        pass
+        arg = self.args[0]
+
+        if type(arg) is Variable:
+            arg = self.runtime.frames[arg.frame][arg.slot]
+
+        self.runtime.dprint(arg)
 
 
 class Break(Instruction):
     def execute(self):
-        pass
+        self.runtime.dump_state(
+            self.runtime.instruction_pointer, self.order, self.runtime.frames.collection)
 
 
-class InstructionFactory:
-    dispatch_dict = {
-        "MOVE": Move,
-        "CREATEFRAME": CreateFrame,
+class StackInstruction(Instruction):
+    def pop(self):
+        if len(self.runtime.data_stack) == 0:
+            exit_with_error(Error.MissingValue)
+
+        return self.runtime.data_stack.pop()
+
+    def pop_pair(self):
+        if len(self.runtime.data_stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = self.runtime.data_stack.pop()
+        arg2 = self.runtime.data_stack.pop()
+
+        return arg2, arg3
+
+
+class Clears(StackInstruction):
+    def execute(self):
+        self.runtime.data_stack.clear()
+
+
+class Adds(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.data_stack.append(arg2 + arg3)
+
+
+class Subs(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.data_stack.append(arg2 - arg3)
+
+
+class Muls(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.data_stack.append(arg2 * arg3)
+
+
+class Idivs(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not int or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        self.runtime.data_stack.append(arg2 // arg3)
+
+
+class Divs(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        float_operands(arg2, arg3)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        self.runtime.data_stack.append(arg2 / arg3)
+
+
+class Int2Floats(StackInstruction):
+    def execute(self):
+        arg2 = self.pop()
+
+        if type(arg2) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(float(arg2))
+
+
+class Float2Ints(StackInstruction):
+    def execute(self):
+        arg2 = self.pop()
+
+        if type(arg2) is not float:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            self.runtime.data_stack.append(int(arg2))
+        except (OverflowError, ValueError):
+            exit_with_error(Error.InvalidOperandValue)
+
+
+class Lts(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(arg2 < arg3)
+
+
+class Gts(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(arg2 > arg3)
+
+
+class Eqs(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(arg2 == arg3)
+
+
+class Ands(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(arg2 and arg3)
+
+
+class Ors(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(arg2 or arg3)
+
+
+class Nots(StackInstruction):
+    def execute(self):
+        arg2 = self.pop()
+
+        if type(arg2) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.data_stack.append(not arg2)
+
+
+class Int2Chars(StackInstruction):
+    def execute(self):
+        arg2 = self.pop()
+
+        if type(arg2) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            self.runtime.data_stack.append(chr(arg2))
+        except ValueError:
+            exit_with_error(Error.InvalidStringOperation)
+
+
+class Stri2Ints(StackInstruction):
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not str or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 >= len(arg2) or arg3 < 0:
+            exit_with_error(Error.InvalidStringOperation)
+
+        self.runtime.data_stack.append(ord(arg2[arg3]))
+
+
+class JumpIfEqs(StackInstruction):
+    operands = ("label",)
+
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            self.runtime.instruction_pointer = self.args[0]
+
+
+class JumpIfNeqs(StackInstruction):
+    operands = ("label",)
+
+    def execute(self):
+        arg2, arg3 = self.pop_pair()
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            self.runtime.instruction_pointer = self.args[0]
+
+
+# Variants picked by the specializer once operands are known. VarVar
+# skips the variable/constant dispatch, VarConst also drops the type
+# checks the constant already satisfies. Error order is the same as in
+# the generic classes.
+class AddVarVar(Add):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 + arg3)
+
+
+class AddVarConst(Add):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 + arg3)
+
+
+class SubVarVar(Sub):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 - arg3)
+
+
+class SubVarConst(Sub):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 - arg3)
+
+
+class MulVarVar(Mul):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 * arg3)
+
+
+class MulVarConst(Mul):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 * arg3)
+
+
+class LtVarVar(Lt):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 < arg3)
+
+
+class LtVarConst(Lt):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 < arg3)
+
+
+class GtVarVar(Gt):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 > arg3)
+
+
+class GtVarConst(Gt):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 > arg3)
+
+
+class EqVarVar(Eq):
+    operands = ("var", "var", "var")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 == arg3)
+
+
+class EqVarConst(Eq):
+    operands = ("var", "var", "const")
+
+    def execute(self):
+        target, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.runtime.frames[target.frame].update(target.slot, arg2 == arg3)
+
+
+class JumpIfEqVarVar(JumpIfEq):
+    operands = ("label", "var", "var")
+
+    def execute(self):
+        arg1, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            self.runtime.instruction_pointer = arg1
+
+
+class JumpIfEqVarConst(JumpIfEq):
+    operands = ("label", "var", "const")
+
+    def execute(self):
+        arg1, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            self.runtime.instruction_pointer = arg1
+
+
+class JumpIfNeqVarVar(JumpIfNeq):
+    operands = ("label", "var", "var")
+
+    def execute(self):
+        arg1, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+        arg3 = self.runtime.frames[arg3.frame][arg3.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            self.runtime.instruction_pointer = arg1
+
+
+class JumpIfNeqVarConst(JumpIfNeq):
+    operands = ("label", "var", "const")
+
+    def execute(self):
+        arg1, arg2, arg3 = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            self.runtime.instruction_pointer = arg1
+
+
+class Nop(Instruction):
+    def execute(self):
+        pass
+
+
+# Superinstructions built by the fuser. Each one stands in for the first
+# instruction of its sequence, the originals stay behind it, so a jump or
+# return into the middle of a sequence still lands on real code. After
+# running, the instruction pointer is left on the last instruction it
+# covers.
+class AddJumpIfNeq(Instruction):
+    # ADD x y c; JUMPIFNEQ label x z
+    operands = ("var", "var", "const", "label", "symbol")
+
+    def execute(self):
+        target, arg2, arg3, label, limit = self.args
+
+        arg2 = self.runtime.frames[arg2.frame][arg2.slot]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        val = arg2 + arg3
+        self.runtime.frames[target.frame].update(target.slot, val)
+
+        if type(limit) is Variable:
+            limit = self.runtime.frames[limit.frame][limit.slot]
+
+        if type(val) is not type(limit) and type(limit) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if val != limit:
+            self.runtime.instruction_pointer = label
+        else:
+            self.runtime.instruction_pointer += 1
+
+
+class Prologue(Instruction):
+    # CREATEFRAME; PUSHFRAME; DEFVAR LF@a; DEFVAR LF@b ...
+    operands = ("vars",)
+
+    def execute(self):
+        frame = Frame(self.runtime.layouts["LF"])
+        for var in self.args[0]:
+            frame[var.slot] = None
+
+        self.runtime.frames["LF"].append(frame)
+        self.runtime.frames["TF"] = None
+
+        self.runtime.instruction_pointer += len(self.args[0]) + 1
+
+
+class Epilogue(Instruction):
+    # POPFRAME; RETURN
+    def execute(self):
+        try:
+            self.runtime.frames["TF"] = self.runtime.frames["LF"].pop()
+        except:
+            exit_with_error(Error.InvalidFrame)
+
+        if len(self.runtime.call_stack) == 0:
+            sys.exit(Error.MissingValue)
+
+        self.runtime.instruction_pointer = self.runtime.call_stack.pop()
+
+
+class PushsCall(Instruction):
+    # PUSHS a; PUSHS b ...; CALL label
+    operands = ("symbols", "label")
+
+    def execute(self):
+        symbols, label = self.args
+
+        for arg in symbols:
+            if type(arg) is Variable:
+                arg = self.runtime.frames[arg.frame][arg.slot]
+
+            self.runtime.data_stack.append(arg)
+
+        # The return address is the CALL itself, as if it ran on its own.
+        self.runtime.call_stack.append(self.runtime.instruction_pointer + len(symbols))
+        self.runtime.instruction_pointer = label
+
+
+# Stand-ins put in by budget.py when limits are set.
+class Checkpoint(Label):
+    # Replaces a LABEL. Jumps are moved one back so they land on it, and
+    # every block entered through a label pays for one check.
+    def execute(self):
+        budget = self.runtime.budget
+        budget.spent += self.args[1]
+        budget.countdown -= 1
+
+        if not budget.countdown:
+            runtime = self.runtime
+            budget.check(
+                len(runtime.call_stack), len(runtime.frames.collection["LF"].collection),
+                len(runtime.data_stack), runtime.held_values)
+
+
+class BoundedConcat(Concat):
+    def execute(self):
+        _, arg2, arg3 = self.args
+
+        if type(arg2) is Variable:
+            arg2 = self.runtime.frames[arg2.frame].raw(arg2.slot)
+
+        if type(arg3) is Variable:
+            arg3 = self.runtime.frames[arg3.frame].raw(arg3.slot)
+
+        self.runtime.budget.check_concat(arg2, arg3)
+        super().execute()
+
+
+# Stand-ins put in by memo.py for calls to pure functions.
+class MemoCall(Call):
+    operands = ("label", "const")
+
+    def execute(self):
+        label, (arity, results) = self.args
+        runtime = self.runtime
+
+        entry = runtime.memo.call(
+            label, arity, results, runtime.data_stack, len(runtime.call_stack) + 1)
+        if entry is not None:
+            frame = Frame(runtime.layouts["TF"])
+            frame.collection = list(entry[1])
+            runtime.frames["TF"] = frame
+            return
+
+        runtime.call_stack.append(runtime.instruction_pointer)
+        runtime.instruction_pointer = label
+
+
+class MemoReturn(Return):
+    def execute(self):
+        runtime = self.runtime
+        runtime.memo.returning(
+            len(runtime.call_stack), runtime.data_stack, runtime.frames["TF"].collection)
+
+        super().execute()
+
+
+# Stand-ins put in by tailcall.py.
+class TailJump(Jump):
+    # CALL, RETURN. A JUMP, kept apart so profiles still count the call.
+    pass
+
+
+class TailCall(Instruction):
+    # CALL, POPFRAME, RETURN. The caller's frame is dropped before the
+    # jump instead of popped after the callee returned, TF still holds what
+    # the callee starts with. With no frame to drop it calls as before, so
+    # the POPFRAME behind it fails at the same point it used to.
+    operands = ("label",)
+
+    def execute(self):
+        runtime = self.runtime
+        local_frames = runtime.frames["LF"]
+
+        if local_frames.collection:
+            local_frames.pop()
+        else:
+            runtime.call_stack.append(runtime.instruction_pointer)
+        runtime.instruction_pointer = self.args[0]
+
+
+class InstructionFactory:
+    dispatch_dict = {
+        "MOVE": Move,
+        "CREATEFRAME": CreateFrame,
         "PUSHFRAME": PushFrame,
         "POPFRAME": PopFrame,
         "DEFVAR": DefVar,
@@ -933,6 +1403,7 @@ class InstructionFactory:
         "SUB": Sub,
         "MUL": Mul,
         "IDIV": Idiv,
+        "DIV": Div,
         "LT": Lt,
         "GT": Gt,
         "EQ": Eq,
@@ -941,6 +1412,8 @@ class InstructionFactory:
         "NOT": Not,
         "INT2CHAR": Int2Char,
         "STRI2INT": Stri2Int,
+        "INT2FLOAT": Int2Float,
+        "FLOAT2INT": Float2Int,
         "READ": Read,
         "WRITE": Write,
         "CONCAT": Concat,
@@ -955,11 +1428,65 @@ class InstructionFactory:
         "EXIT": Exit,
         "DPRINT": DPrint,
         "BREAK": Break,
+        "CLEARS": Clears,
+        "ADDS": Adds,
+        "SUBS": Subs,
+        "MULS": Muls,
+        "IDIVS": Idivs,
+        "DIVS": Divs,
+        "INT2FLOATS": Int2Floats,
+        "FLOAT2INTS": Float2Ints,
+        "LTS": Lts,
+        "GTS": Gts,
+        "EQS": Eqs,
+        "ANDS": Ands,
+        "ORS": Ors,
+        "NOTS": Nots,
+        "INT2CHARS": Int2Chars,
+        "STRI2INTS": Stri2Ints,
+        "JUMPIFEQS": JumpIfEqs,
+        "JUMPIFNEQS": JumpIfNeqs,
+    }
+
+    specialized_dict = {
+        "ADD_VV": AddVarVar,
+        "ADD_VC": AddVarConst,
+        "SUB_VV": SubVarVar,
+        "SUB_VC": SubVarConst,
+        "MUL_VV": MulVarVar,
+        "MUL_VC": MulVarConst,
+        "LT_VV": LtVarVar,
+        "LT_VC": LtVarConst,
+        "GT_VV": GtVarVar,
+        "GT_VC": GtVarConst,
+        "EQ_VV": EqVarVar,
+        "EQ_VC": EqVarConst,
+        "JUMPIFEQ_VV": JumpIfEqVarVar,
+        "JUMPIFEQ_VC": JumpIfEqVarConst,
+        "JUMPIFNEQ_VV": JumpIfNeqVarVar,
+        "JUMPIFNEQ_VC": JumpIfNeqVarConst,
+        "NOP": Nop,
+        "ADD_JUMPIFNEQ": AddJumpIfNeq,
+        "PROLOGUE": Prologue,
+        "EPILOGUE": Epilogue,
+        "PUSHS_CALL": PushsCall,
+        "CHECKPOINT": Checkpoint,
+        "CONCAT_BOUNDED": BoundedConcat,
+        "MEMO_CALL": MemoCall,
+        "MEMO_RETURN": MemoReturn,
+        "TAIL_JUMP": TailJump,
+        "TAIL_CALL": TailCall,
     }
 
     @classmethod
     def create_instruction(cls, element, runtime):
         try:
-            return cls.dispatch_dict[element.attrib['opcode'].upper()](element, runtime)
+            instruction_class = cls.dispatch_dict[element.attrib['opcode'].upper()]
         except KeyError:
             exit_with_error(Error.InvalidXmlStructure)
+
+        return instruction_class(element, runtime)
+
+    @classmethod
+    def restore_instruction(cls, opcode, args, runtime, order=None):
+        return cls.dispatch_dict[opcode].restore(args, runtime, order)
@@ -1,53 +1,220 @@
-from argument_parser import ArgumentParser
-from instruction import InstructionFactory
-from xmlparser import XmlParser
-from error import Error, exit_with_error
-from runtime import Runtime
-import sys
-
-
-def validate_children(children):
-    orders = []
-    for child in children:
-        if not child.attrib.get("order", None):
-            exit_with_error(Error.InvalidXmlStructure)
-        try:
-            order = int(child.attrib["order"])
-        except:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        if order <= 0:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        if order in orders:
-            exit_with_error(Error.InvalidXmlStructure)
-
-        if child.tag != "instruction":
-            exit_with_error(Error.InvalidXmlStructure)
-        
-        orders.append(order)
-
-    try:
-        children = sorted(children, key=lambda x: int(x.attrib["order"]))
-    except KeyError:
-        pass
-
-    return children
-
-
-if __name__ == "__main__":
-    argparser = ArgumentParser()
-    args = argparser.parse_args()
-
-    xmlparser = XmlParser(args.source)
-    xmlroot = xmlparser.parse_input()
-
-    runtime = Runtime(args.input)
-
-    instructions = validate_children(list(xmlroot))
-
-
-    instructions = [InstructionFactory.create_instruction(
-        elem, runtime) for elem in instructions]
-
-    runtime.run(instructions)
+from argument_parser import ArgumentParser
+from loader import Loader
+from cache import ProgramCache
+from xmlparser import XmlParser
+from error import Error, exit_with_error
+from runtime import Runtime
+from instruction import Break, DPrint
+from compiler import compile_program
+from specializer import Specializer
+from memo import Memo
+from fusion import Fuser
+from tailcall import TailCallEliminator
+from budget import create_budget
+from optimizer import Optimizer, print_listing
+from vm import VirtualMachine
+from profiler import Profiler
+from tracer import FrameDumper, InstructionTracer, RingTracer
+import gc
+import io
+import os
+import sys
+
+
+def load_program(args, runtime, input=None):
+    # Loading only builds acyclic objects, so collecting while it runs is
+    # wasted work. Whatever survives is frozen out of later collections.
+    gc.disable()
+    try:
+        instructions, program, loader, cache, optimizer, specializer, tail_calls, fuser = _load(
+            args, runtime, input)
+        gc.freeze()
+    finally:
+        gc.enable()
+
+    if args.load_timings:
+        if args.cache_dir:
+            cache.report(sys.stderr)
+        loader.report(sys.stderr, len(instructions))
+        if optimizer is not None:
+            optimizer.report(sys.stderr)
+        if specializer is not None:
+            specializer.report(sys.stderr)
+        if tail_calls is not None:
+            tail_calls.report(sys.stderr)
+        if fuser is not None:
+            fuser.report(sys.stderr)
+
+    return instructions, program
+
+
+def _load(args, runtime, input):
+    xmlparser = XmlParser(args.source)
+    loader = Loader(runtime)
+
+    cache = None
+    instructions = None
+    if args.cache_dir:
+        cache = ProgramCache(args.cache_dir)
+        source = xmlparser.read_source()
+
+        with loader.timed("cache"):
+            instructions = cache.load(source, runtime)
+
+    if instructions is None:
+        if args.cache_dir:
+            xmlparser = XmlParser(io.BytesIO(source))
+
+        loader.feed(xmlparser.iter_children())
+
+        if input is not None:
+            runtime.open_input(input)
+
+        instructions = loader.finish()
+
+        if args.cache_dir:
+            with loader.timed("cache"):
+                cache.store(source, instructions, runtime)
+    elif input is not None:
+        runtime.open_input(input)
+
+    if args.no_diagnostics:
+        # Dropped before linking, so labels resolve to the shifted indices
+        # and the run loops never see the debug instructions.
+        instructions = [
+            instruction for instruction in instructions
+            if type(instruction) is not DPrint and type(instruction) is not Break
+        ]
+
+    with loader.timed("link"):
+        runtime.link(instructions)
+
+    optimizer = None
+    if args.optimize or args.optimized_listing:
+        # Runs after linking, so undefined labels in dead code are still
+        # reported.
+        optimizer = Optimizer(runtime)
+        with loader.timed("optimize"):
+            instructions = optimizer.optimize(instructions)
+
+        if args.optimized_listing:
+            print_listing(instructions, sys.stderr)
+
+    specializer = None
+    if not args.no_specialize:
+        specializer = Specializer(runtime)
+        with loader.timed("specialize"):
+            instructions = specializer.specialize(instructions)
+
+    if not args.no_memoize:
+        # Before fusion, which would hide the CALLs and RETURNs it replaces.
+        runtime.memo = Memo(args.memo_size)
+        with loader.timed("memoize"):
+            instructions = runtime.memo.apply(instructions, runtime)
+
+    tail_calls = None
+    if not args.no_tail_calls:
+        # After memoization, a memoized CALL has to come back to store its
+        # results.
+        tail_calls = TailCallEliminator(runtime)
+        with loader.timed("tail calls"):
+            instructions = tail_calls.eliminate(instructions)
+
+    fuser = None
+    if not args.no_fuse:
+        fuser = Fuser(runtime)
+        with loader.timed("fuse"):
+            instructions = fuser.fuse(instructions)
+
+    runtime.budget = create_budget(args)
+    if runtime.budget is not None:
+        with loader.timed("budget"):
+            instructions = runtime.budget.apply(instructions, runtime)
+
+    program = None
+    if args.engine == "bytecode":
+        with loader.timed("compile"):
+            program = compile_program(instructions)
+
+    return instructions, program, loader, cache, optimizer, specializer, tail_calls, fuser
+
+
+def execute(instructions, program, runtime, profiler=None, tracer=None):
+    if tracer is not None:
+        if program is not None:
+            VirtualMachine(program, runtime).trace(tracer)
+        else:
+            runtime.trace(instructions, tracer)
+    elif profiler is not None:
+        if program is not None:
+            VirtualMachine(program, runtime).profile(profiler)
+        else:
+            runtime.profile(instructions, profiler)
+    elif program is not None:
+        VirtualMachine(program, runtime).run()
+    else:
+        runtime.run(instructions)
+
+
+def create_tracer(args, instructions, runtime):
+    # DEBUG=1 is read once here, the run loops never look at the
+    # environment.
+    trace = args.trace
+    if trace is None and os.environ.get("DEBUG") == "1":
+        trace = "frames"
+
+    if trace is None:
+        return None
+
+    stream = sys.stderr
+    if args.trace_file:
+        try:
+            stream = open(args.trace_file, "w")
+        except OSError:
+            exit_with_error(Error.InvalidFile)
+    elif trace == "frames":
+        stream = runtime.output
+
+    if trace == "frames":
+        return FrameDumper(instructions, stream)
+
+    if trace == "instructions":
+        return InstructionTracer(instructions, stream, args.trace_sample)
+
+    return RingTracer(instructions, stream, args.trace_size)
+
+
+def report_profile(args, profiler):
+    if args.profile:
+        profiler.report(sys.stderr)
+
+    if args.profile_json:
+        try:
+            profiler.dump(args.profile_json)
+        except OSError:
+            exit_with_error(Error.InvalidFile)
+
+
+if __name__ == "__main__":
+    argparser = ArgumentParser()
+    args = argparser.parse_args()
+
+    runtime = Runtime(args.output_buffer)
+
+    instructions, program = load_program(args, runtime, args.input)
+
+    runtime.reset()
+
+    profiler = None
+    if args.profile or args.profile_json:
+        profiler = Profiler(instructions)
+
+    tracer = create_tracer(args, instructions, runtime)
+
+    try:
+        execute(instructions, program, runtime, profiler=profiler, tracer=tracer)
+    finally:
+        if profiler is not None:
+            report_profile(args, profiler)
+        if args.memo_stats and runtime.memo is not None:
+            runtime.memo.report(sys.stderr)
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from time import perf_counter
+from error import Error, exit_with_error
+from instruction import InstructionFactory
+
+
+class Loader:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.orders = set()
+        self.max_order = 0
+        self.instructions = []
+        self.timings = {}
+
+        # Errors are held back until the whole document has been read, so
+        # that malformed XML still wins over structure errors and those over
+        # operand errors, the same as when the tree was parsed up front.
+        self.structure_error = None
+        self.decode_errors = []
+
+    def validate(self, child):
+        if not child.attrib.get("order", None):
+            exit_with_error(Error.InvalidXmlStructure)
+        try:
+            order = int(child.attrib["order"])
+        except:
+            exit_with_error(Error.InvalidXmlStructure)
+
+        if order <= 0:
+            exit_with_error(Error.InvalidXmlStructure)
+
+        if order in self.orders:
+            exit_with_error(Error.InvalidXmlStructure)
+
+        if child.tag != "instruction":
+            exit_with_error(Error.InvalidXmlStructure)
+
+        self.orders.add(order)
+        self.max_order = max(self.max_order, order)
+
+        return order
+
+    def feed(self, children):
+        validate_time = 0
+        decode_time = 0
+
+        with self.timed("parse"):
+            for child in children:
+                if self.structure_error is not None:
+                    continue
+
+                start = perf_counter()
+                try:
+                    order = self.validate(child)
+                except SystemExit as error:
+                    self.structure_error = error.code
+                    continue
+                finally:
+                    validate_time += perf_counter() - start
+
+                start = perf_counter()
+                try:
+                    self.instructions.append(
+                        (order, InstructionFactory.create_instruction(child, self.runtime)))
+                except SystemExit as error:
+                    self.decode_errors.append((order, error.code))
+                finally:
+                    decode_time += perf_counter() - start
+
+        # Validation and decoding run inside the parse loop, keep the
+        # parse figure to the XML work alone.
+        self.timings["parse"] -= validate_time + decode_time
+        self.timings["validate"] = validate_time
+        self.timings["decode"] = decode_time
+
+    def finish(self):
+        if self.structure_error is not None:
+            exit_with_error(self.structure_error)
+
+        if self.decode_errors:
+            exit_with_error(min(self.decode_errors)[1])
+
+        with self.timed("order"):
+            return self.order()
+
+    def order(self):
+        # Orders of generated programs are usually 1..n with few gaps, so
+        # they can be placed by index instead of sorted.
+        if self.max_order <= 2 * len(self.instructions):
+            placed = [None] * (self.max_order + 1)
+            for order, instruction in self.instructions:
+                instruction.order = order
+                placed[order] = instruction
+
+            return [instruction for instruction in placed if instruction is not None]
+
+        self.instructions.sort(key=lambda x: x[0])
+        for order, instruction in self.instructions:
+            instruction.order = order
+
+        return [instruction for _, instruction in self.instructions]
+
+    @contextmanager
+    def timed(self, phase):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0) + perf_counter() - start
+
+    def report(self, stream, count):
+        phases = ", ".join(
+            f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in self.timings.items())
+        total = sum(self.timings.values()) * 1000
+
+        print(f"load: {count} instructions in {total:.1f}ms ({phases})",
+              file=stream)
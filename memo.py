@@ -0,0 +1,281 @@
+from collections import OrderedDict
+from instruction import *
+
+
+# A function is the code reachable from a CALL target. It is memoized
+# when it cannot observe or change anything but its own frame and the
+# top of the data stack:
+#  - it starts with CREATEFRAME, PUSHFRAME and leaves only through
+#    POPFRAME, RETURN, with no other frame changes in between,
+#  - it never touches GF, does no I/O, EXIT, DPRINT, BREAK or CLEARS,
+#  - every instruction is reached with one data stack height, so it
+#    always consumes the same number of arguments and leaves the same
+#    number of results,
+#  - everything it calls is memoizable as well.
+# POPFRAME leaves the function's frame in TF, so that is cached too.
+FORBIDDEN = (
+    Read, Write, Exit, DPrint, Break, Clears, CreateFrame, PushFrame, Return,
+)
+
+# (popped, pushed) for instructions working on the data stack.
+STACK_EFFECTS = {
+    Pushs: (0, 1),
+    Pops: (1, 0),
+    Adds: (2, 1),
+    Subs: (2, 1),
+    Muls: (2, 1),
+    Idivs: (2, 1),
+    Divs: (2, 1),
+    Int2Floats: (1, 1),
+    Float2Ints: (1, 1),
+    Lts: (2, 1),
+    Gts: (2, 1),
+    Eqs: (2, 1),
+    Ands: (2, 1),
+    Ors: (2, 1),
+    Nots: (1, 1),
+    Int2Chars: (1, 1),
+    Stri2Ints: (2, 1),
+    JumpIfEqs: (2, 0),
+    JumpIfNeqs: (2, 0),
+}
+
+
+class NotPure(Exception):
+    pass
+
+
+def memo_key(val):
+    # 1, 1.0 and true are equal in Python but not in IPPcode23, and -0.0
+    # prints differently from 0.0.
+    if type(val) is float:
+        return float, val.hex()
+    if type(val) is Nil:
+        return Nil, None
+    return type(val), val
+
+
+class Memo:
+    def __init__(self, size=4096):
+        self.size = size
+        self.functions = {}
+        self.names = {}
+        self.cache = OrderedDict()
+        self.pending = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def reset(self):
+        # Cached results stay valid for every run, only calls in flight go.
+        self.pending.clear()
+
+    def apply(self, instructions, runtime):
+        self.functions = find_functions(instructions)
+        self.names = {label: instructions[label].args[0] for label in self.functions}
+        if not self.functions:
+            return instructions
+
+        bodies = set()
+        for _, _, body in self.functions.values():
+            bodies.update(body)
+
+        memoized = list(instructions)
+        for idx, instruction in enumerate(instructions):
+            if type(instruction) is Call and instruction.args[0] in self.functions:
+                arity, results, _ = self.functions[instruction.args[0]]
+                memoized[idx] = MemoCall.restore(
+                    (instruction.args[0], (arity, results)), runtime, instruction.order)
+            elif type(instruction) is PopFrame and idx in bodies:
+                memoized[idx + 1] = MemoReturn.restore((), runtime, instructions[idx + 1].order)
+
+        return memoized
+
+    def call(self, label, arity, results, stack, depth):
+        # Returns the cached results and TF on a hit. On a miss the call
+        # is remembered, so its RETURN can store what it computed.
+        if len(stack) < arity:
+            return None
+
+        key = (label, *[memo_key(stack[-idx]) for idx in range(arity, 0, -1)])
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+
+            for _ in range(arity):
+                stack.pop()
+            stack.extend(entry[0])
+            return entry
+
+        self.misses += 1
+        self.pending.append((depth, key, results))
+        return None
+
+    def returning(self, depth, stack, frame):
+        if not self.pending or self.pending[-1][0] != depth:
+            return
+
+        _, key, results = self.pending.pop()
+        values = tuple(stack[-idx] for idx in range(results, 0, -1))
+        frame = [str(val) if type(val) is StringBuffer else val for val in frame]
+
+        self.cache[key] = (values, frame)
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def report(self, stream):
+        names = ", ".join(self.names.values())
+        print(f"memoized: {len(self.functions)} functions"
+              + (f" ({names})" if names else "")
+              + f", hits {self.hits}, misses {self.misses}, evictions {self.evictions}",
+              file=stream)
+
+
+def find_functions(instructions):
+    # Calls make a function depend on the effect of its callees, including
+    # itself, so effects are found by iterating until nothing changes. A
+    # call whose callee is not known yet only cuts that path short. Only
+    # the callers of a function whose effect changed are analyzed again.
+    targets = list(dict.fromkeys(
+        instruction.args[0] for instruction in instructions if type(instruction) is Call))
+
+    callers = {target: set() for target in targets}
+    rounds = dict.fromkeys(targets, 0)
+    effects = {}
+
+    pending = list(reversed(targets))
+    queued = set(targets)
+    while pending:
+        target = pending.pop()
+        queued.discard(target)
+
+        callees = set()
+        try:
+            found = analyze(instructions, target, effects, strict=False, callees=callees)
+        except NotPure:
+            found = None
+
+        for callee in callees:
+            callers[callee].add(target)
+
+        # Recursion can flip an effect back and forth, a function that
+        # has not settled after as many rounds as it has callees is
+        # dropped.
+        rounds[target] += 1
+        if rounds[target] > len(callees) + 2:
+            found = None
+
+        effect = found[0] if found is not None else None
+        if effect == effects.get(target):
+            continue
+
+        if effect is None:
+            del effects[target]
+        else:
+            effects[target] = effect
+
+        for caller in callers[target]:
+            if caller not in queued:
+                queued.add(caller)
+                pending.append(caller)
+
+    # With every effect fixed, each function has to check out on all of
+    # its paths. Dropping one can fail its callers, so those are checked
+    # again.
+    functions = {}
+    pending = list(effects)
+    while pending:
+        target = pending.pop()
+        if target not in effects:
+            continue
+
+        try:
+            found = analyze(instructions, target, effects, strict=True)
+        except NotPure:
+            found = None
+
+        if found is not None and found[0] == effects[target]:
+            functions[target] = (*effects[target], found[1])
+            continue
+
+        del effects[target]
+        functions.pop(target, None)
+        pending.extend(caller for caller in callers[target] if caller in effects)
+
+    return {target: functions[target] for target in targets if target in functions}
+
+
+def analyze(instructions, label, effects, strict, callees=None):
+    # Returns ((arguments, results), body), or None when no RETURN was
+    # reached. Every callee met on the way is added to callees.
+    if label + 2 >= len(instructions):
+        raise NotPure
+    if type(instructions[label + 1]) is not CreateFrame or type(instructions[label + 2]) is not PushFrame:
+        raise NotPure
+
+    heights = {label + 3: 0}
+    pending = [label + 3]
+    lowest = 0
+    exits = set()
+
+    while pending:
+        idx = pending.pop()
+        height = heights[idx]
+
+        if idx >= len(instructions):
+            raise NotPure
+
+        instruction = instructions[idx]
+        instruction_class = type(instruction)
+
+        if isinstance(instruction, FORBIDDEN):
+            raise NotPure
+        if any(type(arg) is Variable and arg.frame == "GF" for arg in instruction.args):
+            raise NotPure
+
+        if instruction_class is PopFrame:
+            if idx + 1 >= len(instructions) or type(instructions[idx + 1]) is not Return:
+                raise NotPure
+            exits.add(height)
+            continue
+
+        successors = (idx + 1,)
+        popped, pushed = STACK_EFFECTS.get(instruction_class, (0, 0))
+
+        if instruction_class is Call:
+            callee = instruction.args[0]
+            if callees is not None:
+                callees.add(callee)
+            if callee not in effects:
+                if strict:
+                    raise NotPure
+                continue
+            popped, pushed = effects[callee]
+        elif instruction_class is Jump:
+            successors = (instruction.args[0],)
+        elif "label" in instruction.operands and instruction_class is not Label:
+            successors = (instruction.args[0], idx + 1)
+
+        lowest = min(lowest, height - popped)
+        height = height - popped + pushed
+
+        for succ in successors:
+            if succ in heights:
+                if heights[succ] != height:
+                    raise NotPure
+                continue
+
+            heights[succ] = height
+            pending.append(succ)
+
+    if not exits:
+        return None
+    if len(exits) != 1:
+        raise NotPure
+
+    arguments = -lowest
+    return (arguments, exits.pop() + arguments), frozenset(heights)
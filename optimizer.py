@@ -0,0 +1,313 @@
+import re
+from instruction import *
+from cache import OPCODES
+
+
+class NotFoldable(Exception):
+    pass
+
+
+FOLDABLE = (
+    Add, Sub, Mul, Idiv, Div, Lt, Gt, Eq, And, Or, Not, Int2Char, Stri2Int,
+    Int2Float, Float2Int, Concat, Strlen, GetChar, Type, JumpIfEq, JumpIfNeq,
+)
+
+
+def fold_value(instruction_class, arg2, arg3=None):
+    # Returns what the instruction would store (or whether the jump is
+    # taken). Anything that would fail at run time raises NotFoldable and
+    # stays in the program, so the error still happens.
+    if instruction_class in (Add, Sub, Mul):
+        if type(arg2) is not type(arg3) or (type(arg2) is not int and type(arg2) is not float):
+            raise NotFoldable
+        if instruction_class is Add:
+            return arg2 + arg3
+        if instruction_class is Sub:
+            return arg2 - arg3
+        return arg2 * arg3
+
+    if instruction_class is Idiv or instruction_class is Div:
+        _type = int if instruction_class is Idiv else float
+        if type(arg2) is not _type or type(arg3) is not _type or arg3 == 0:
+            raise NotFoldable
+        return arg2 // arg3 if instruction_class is Idiv else arg2 / arg3
+
+    if instruction_class is Lt or instruction_class is Gt:
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            raise NotFoldable
+        return arg2 < arg3 if instruction_class is Lt else arg2 > arg3
+
+    if instruction_class in (Eq, JumpIfEq, JumpIfNeq):
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            raise NotFoldable
+        return arg2 != arg3 if instruction_class is JumpIfNeq else arg2 == arg3
+
+    if instruction_class is And or instruction_class is Or:
+        if type(arg2) is not bool or type(arg3) is not bool:
+            raise NotFoldable
+        return (arg2 and arg3) if instruction_class is And else (arg2 or arg3)
+
+    if instruction_class is Not:
+        if type(arg2) is not bool:
+            raise NotFoldable
+        return not arg2
+
+    if instruction_class is Int2Char:
+        if type(arg2) is not int or arg2 < 0 or arg2 > 0x10FFFF:
+            raise NotFoldable
+        return chr(arg2)
+
+    if instruction_class is Int2Float:
+        if type(arg2) is not int:
+            raise NotFoldable
+        return float(arg2)
+
+    if instruction_class is Float2Int:
+        if type(arg2) is not float or arg2 != arg2 or arg2 in (float("inf"), float("-inf")):
+            raise NotFoldable
+        return int(arg2)
+
+    if instruction_class is Concat:
+        if type(arg2) is not str or type(arg3) is not str:
+            raise NotFoldable
+        return arg2 + arg3
+
+    if instruction_class is Strlen:
+        if type(arg2) is not str:
+            raise NotFoldable
+        return len(arg2)
+
+    if instruction_class is GetChar or instruction_class is Stri2Int:
+        if type(arg2) is not str or type(arg3) is not int or arg3 >= len(arg2) or arg3 < 0:
+            raise NotFoldable
+        return arg2[arg3] if instruction_class is GetChar else ord(arg2[arg3])
+
+    # TYPE
+    if type(arg2) is Nil:
+        return "nil"
+    return {int: "int", bool: "bool", str: "string", float: "float"}[type(arg2)]
+
+
+ENDS_BLOCK = (Jump, JumpIfEq, JumpIfNeq, JumpIfEqs, JumpIfNeqs, Call, Return, Exit)
+FRAME_CHANGES = (CreateFrame, PushFrame, PopFrame)
+
+
+class Optimizer:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.stats = {"propagated": 0, "folded": 0, "jumps": 0, "unreachable": 0}
+
+    def optimize(self, instructions):
+        # Folding a conditional jump can make more code unreachable, which
+        # in turn can merge blocks, so both passes run until nothing moves.
+        while True:
+            instructions, folded = self.fold(instructions)
+            instructions, pruned = self.prune(instructions)
+
+            if not folded and not pruned:
+                break
+
+        self.runtime.labels = {
+            instruction.args[0]: idx
+            for idx, instruction in enumerate(instructions)
+            if type(instruction) is Label
+        }
+
+        return instructions
+
+    def restore(self, instruction_class, args, instruction):
+        return instruction_class.restore(args, self.runtime, instruction.order)
+
+    def fold(self, instructions):
+        # Values known within the current basic block: a variable maps to
+        # a constant or to another variable holding the same value. A
+        # variable only gets an entry after an instruction that wrote it
+        # succeeded, so reading it can no longer fail.
+        known = {}
+        changed = False
+        folded = []
+
+        for instruction in instructions:
+            if type(instruction) is Label:
+                known.clear()
+
+            instruction, substituted = self.substitute(instruction, known)
+            changed |= substituted
+
+            replacement = self.evaluate(instruction)
+            if replacement is not instruction:
+                changed = True
+                instruction = replacement
+
+            if instruction is not None:
+                self.learn(instruction, known)
+
+            folded.append(instruction)
+
+        return folded, changed
+
+    def substitute(self, instruction, known):
+        args = list(instruction.args)
+        substituted = False
+
+        for idx, kind in enumerate(instruction.operands):
+            if kind == "symbol" and type(args[idx]) is Variable and args[idx] in known:
+                args[idx] = known[args[idx]]
+                substituted = True
+
+        if not substituted:
+            return instruction, False
+
+        self.stats["propagated"] += 1
+        return self.restore(type(instruction), tuple(args), instruction), True
+
+    def evaluate(self, instruction):
+        instruction_class = type(instruction)
+        if instruction_class not in FOLDABLE:
+            return instruction
+
+        target, *operands = instruction.args
+        if any(type(arg) is Variable for arg in operands):
+            return instruction
+
+        try:
+            val = fold_value(instruction_class, *operands)
+        except NotFoldable:
+            return instruction
+
+        if instruction_class is JumpIfEq or instruction_class is JumpIfNeq:
+            self.stats["jumps"] += 1
+            return self.restore(Jump, (target,), instruction) if val else None
+
+        self.stats["folded"] += 1
+        return self.restore(Move, (target, val), instruction)
+
+    def learn(self, instruction, known):
+        if isinstance(instruction, ENDS_BLOCK):
+            known.clear()
+            return
+
+        if isinstance(instruction, FRAME_CHANGES):
+            # LF and TF now name other frames.
+            for var, val in list(known.items()):
+                if var.frame != "GF" or (type(val) is Variable and val.frame != "GF"):
+                    del known[var]
+            return
+
+        if not instruction.operands or instruction.operands[0] != "var":
+            return
+
+        target = instruction.args[0]
+        for var, val in list(known.items()):
+            if var == target or val == target:
+                del known[var]
+
+        if type(instruction) is Move and instruction.args[1] != target:
+            known[target] = instruction.args[1]
+
+    def successors(self, instructions, idx):
+        instruction = instructions[idx]
+        instruction_class = type(instruction)
+
+        if instruction_class is Jump:
+            return (instruction.args[0],)
+
+        if instruction_class is Return or instruction_class is Exit:
+            return ()
+
+        if "label" in instruction.operands and instruction_class is not Label:
+            # Conditional jumps and CALL, which comes back to the next
+            # instruction.
+            return (instruction.args[0], idx + 1)
+
+        return (idx + 1,)
+
+    def prune(self, instructions):
+        present = [idx for idx, instruction in enumerate(instructions) if instruction is not None]
+        changed = len(present) != len(instructions)
+
+        # Deleted jumps fall through, so point every index at the next
+        # instruction that is still there.
+        following = [len(instructions)] * (len(instructions) + 1)
+        for idx in range(len(instructions) - 1, -1, -1):
+            following[idx] = idx if instructions[idx] is not None else following[idx + 1]
+
+        reachable = set()
+        pending = [following[0]]
+        while pending:
+            idx = pending.pop()
+            if idx >= len(instructions) or idx in reachable:
+                continue
+
+            reachable.add(idx)
+            pending.extend(following[succ] for succ in self.successors(instructions, idx))
+
+        kept = [idx for idx in present if idx in reachable]
+        self.stats["unreachable"] += len(present) - len(kept)
+        changed |= len(kept) != len(present)
+
+        # A JUMP to the label right after it does nothing.
+        jumps = [
+            idx for pos, idx in enumerate(kept)
+            if type(instructions[idx]) is Jump and pos + 1 < len(kept)
+            and kept[pos + 1] == instructions[idx].args[0]
+        ]
+        if jumps:
+            changed = True
+            self.stats["jumps"] += len(jumps)
+            jumps = set(jumps)
+            kept = [idx for idx in kept if idx not in jumps]
+
+        position = {idx: pos for pos, idx in enumerate(kept)}
+        pruned = []
+        for idx in kept:
+            instruction = instructions[idx]
+            if "label" in instruction.operands and type(instruction) is not Label:
+                instruction.args = tuple(
+                    position[arg] if kind == "label" else arg
+                    for kind, arg in zip(instruction.operands, instruction.args)
+                )
+            pruned.append(instruction)
+
+        return pruned, changed
+
+    def report(self, stream):
+        stats = ", ".join(f"{name} {count}" for name, count in self.stats.items())
+        print(f"optimized: {stats}", file=stream)
+
+
+def format_operand(kind, arg, instructions):
+    if kind == "label":
+        # Jumps hold the index of their label, LABEL itself the name.
+        return arg if type(arg) is str else instructions[arg].args[0]
+
+    if kind == "type":
+        return arg
+
+    if type(arg) is Variable:
+        return f"{arg.frame}@{arg.name}"
+
+    if type(arg) is Nil:
+        return "nil@nil"
+
+    if type(arg) is bool:
+        return f"bool@{str(arg).lower()}"
+
+    if type(arg) is int:
+        return f"int@{arg}"
+
+    if type(arg) is float:
+        return f"float@{arg.hex()}"
+
+    return "string@" + re.sub(r"[\x00-\x20#\\]", lambda x: f"\\{ord(x.group()):03d}", arg)
+
+
+def print_listing(instructions, stream):
+    print(".IPPcode23", file=stream)
+
+    for instruction in instructions:
+        operands = " ".join(
+            format_operand(kind, arg, instructions)
+            for kind, arg in zip(instruction.operands, instruction.args)
+        )
+        print(f"{OPCODES[type(instruction)]} {operands}".rstrip(), file=stream)
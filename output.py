@@ -0,0 +1,26 @@
+import sys
+
+
+class OutputBuffer:
+    def __init__(self, stream=sys.stdout, size=8192):
+        self.stream = stream
+        self.size = size
+        self.chunks = []
+        self.length = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.length += len(text)
+
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if not self.chunks:
+            return
+
+        self.stream.write("".join(self.chunks))
+        self.stream.flush()
+
+        self.chunks.clear()
+        self.length = 0
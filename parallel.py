@@ -0,0 +1,121 @@
+from argument_parser import ParallelArgumentParser
+from batch import run_case
+from error import Error, exit_with_error
+from interpret import load_program
+from runtime import Runtime
+from collections import Counter
+import copy
+import io
+import json
+import multiprocessing
+import shlex
+import signal
+import sys
+import time
+
+
+# Per-worker state, set up by init_worker in every pool process.
+settings = None
+programs = {}
+
+
+def read_jobs(path):
+    jobs = []
+    with open(path) as file:
+        for line in file:
+            fields = shlex.split(line)
+            if not fields:
+                continue
+            if len(fields) != 2:
+                exit_with_error(Error.MissingArguments)
+            jobs.append((fields[0], fields[1]))
+
+    return jobs
+
+
+def init_worker(args):
+    global settings
+    settings = args
+
+    signal.signal(signal.SIGALRM, on_timeout)
+
+
+def on_timeout(signum, frame):
+    exit_with_error(Error.TimeLimitExceeded)
+
+
+def get_program(source):
+    if source not in programs:
+        load_args = copy.copy(settings)
+        load_args.source = source
+
+        runtime = Runtime(settings.output_buffer)
+        try:
+            programs[source] = (runtime, *load_program(load_args, runtime))
+        except SystemExit as error:
+            programs[source] = int(error.code)
+
+    return programs[source]
+
+
+def run_job(job):
+    index, (source, input) = job
+    stderr = io.StringIO()
+    start = time.perf_counter()
+
+    sys.stderr = stderr
+    try:
+        loaded = get_program(source)
+
+        if type(loaded) is int:
+            stdout, code = "", loaded
+        else:
+            runtime, instructions, program = loaded
+            stdout, code = "", int(Error.TimeLimitExceeded)
+            try:
+                if settings.timeout:
+                    signal.setitimer(signal.ITIMER_REAL, settings.timeout)
+                # Limits were applied to the program when it was loaded.
+                stdout, code = run_case(instructions, program, runtime, input)
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            except SystemExit:
+                # The timer went off between the end of the run and disarming it.
+                pass
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        sys.stderr = sys.__stderr__
+
+    return {
+        "job": index,
+        "source": source,
+        "input": input,
+        "code": code,
+        "stdout": stdout,
+        "stderr": stderr.getvalue(),
+        "time": time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    argparser = ParallelArgumentParser()
+    args = argparser.parse_args()
+
+    jobs = list(enumerate(read_jobs(args.jobs)))
+
+    # Jobs of the same program are handed out together so each worker
+    # loads as few programs as possible.
+    jobs.sort(key=lambda job: job[1][0])
+
+    workers = args.workers or multiprocessing.cpu_count()
+    chunksize = max(1, len(jobs) // (workers * 4))
+
+    codes = Counter()
+    with multiprocessing.Pool(workers, init_worker, (args,)) as pool, \
+            open(args.results, "w") as results:
+        for result in pool.imap(run_job, jobs, chunksize):
+            results.write(json.dumps(result) + "\n")
+            codes[result["code"]] += 1
+
+    print(f"{len(jobs)} jobs: " + ", ".join(
+        f"{count} x {code}" for code, count in sorted(codes.items())))
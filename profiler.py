@@ -0,0 +1,127 @@
+import json
+from instruction import Call, Checkpoint, Label, PushsCall, TailCall, TailJump
+from cache import OPCODES
+
+
+class Profiler:
+    def __init__(self, instructions, top=20):
+        self.instructions = instructions
+        self.top = top
+
+        # Counters are kept per instruction index and only grouped by
+        # opcode, order and label when the report is built.
+        self.counts = [0] * len(instructions)
+        self.times = [0.0] * len(instructions)
+
+        self.max_data_stack = 0
+        self.max_call_depth = 0
+        self.max_local_depth = 0
+
+    def observe(self, data_stack, call_depth, local_depth):
+        if data_stack > self.max_data_stack:
+            self.max_data_stack = data_stack
+        if call_depth > self.max_call_depth:
+            self.max_call_depth = call_depth
+        if local_depth > self.max_local_depth:
+            self.max_local_depth = local_depth
+
+    def opcodes(self):
+        stats = {}
+        for instruction, count, seconds in zip(self.instructions, self.counts, self.times):
+            if count == 0:
+                continue
+
+            opcode = OPCODES[type(instruction)]
+            total_count, total_seconds = stats.get(opcode, (0, 0.0))
+            stats[opcode] = (total_count + count, total_seconds + seconds)
+
+        return sorted(
+            ({"opcode": opcode, "count": count, "seconds": seconds}
+             for opcode, (count, seconds) in stats.items()),
+            key=lambda x: x["seconds"], reverse=True)
+
+    def hot_instructions(self):
+        hot = [
+            {
+                "order": instruction.order,
+                "opcode": OPCODES[type(instruction)],
+                "count": count,
+                "seconds": seconds,
+            }
+            for instruction, count, seconds in zip(self.instructions, self.counts, self.times)
+            if count
+        ]
+
+        return sorted(hot, key=lambda x: x["seconds"], reverse=True)
+
+    def label_calls(self):
+        calls = {}
+        for instruction, count in zip(self.instructions, self.counts):
+            if not count:
+                continue
+
+            # Fusion, memoization and tail calls replace CALLs, a memoized
+            # hit is still a call of its label.
+            if isinstance(instruction, (Call, TailCall, TailJump)):
+                idx = instruction.args[0]
+            elif type(instruction) is PushsCall:
+                idx = instruction.args[1]
+            else:
+                continue
+
+            if idx + 1 < len(self.instructions) and type(self.instructions[idx + 1]) is Checkpoint:
+                # Under a budget calls land just before the checkpoint.
+                idx += 1
+
+            target = self.instructions[idx]
+            name = target.args[0] if isinstance(target, Label) else str(target.order)
+            calls[name] = calls.get(name, 0) + count
+
+        return sorted(
+            ({"label": label, "calls": count} for label, count in calls.items()),
+            key=lambda x: x["calls"], reverse=True)
+
+    def summary(self):
+        return {
+            "executed": sum(self.counts),
+            "seconds": sum(self.times),
+            "max_data_stack": self.max_data_stack,
+            "max_call_depth": self.max_call_depth,
+            "max_local_depth": self.max_local_depth,
+            "opcodes": self.opcodes(),
+            "instructions": self.hot_instructions(),
+            "labels": self.label_calls(),
+        }
+
+    def report(self, stream):
+        summary = self.summary()
+        executed = summary["executed"]
+        seconds = summary["seconds"]
+
+        print(f"profile: {executed} instructions in {seconds * 1000:.1f}ms", file=stream)
+        print(f"max depth: data stack {summary['max_data_stack']}, "
+              f"call {summary['max_call_depth']}, LF {summary['max_local_depth']}",
+              file=stream)
+
+        print(f"\n{'opcode':<12}{'count':>12}{'ms':>12}{'ns/op':>10}{'time %':>9}", file=stream)
+        for row in summary["opcodes"]:
+            print(f"{row['opcode']:<12}{row['count']:>12}{row['seconds'] * 1000:>12.2f}"
+                  f"{row['seconds'] / row['count'] * 1e9:>10.0f}"
+                  f"{row['seconds'] / seconds * 100 if seconds else 0:>9.1f}",
+                  file=stream)
+
+        print(f"\n{'order':>8}  {'opcode':<12}{'count':>12}{'ms':>12}", file=stream)
+        for row in summary["instructions"][:self.top]:
+            print(f"{row['order']:>8}  {row['opcode']:<12}{row['count']:>12}"
+                  f"{row['seconds'] * 1000:>12.2f}",
+                  file=stream)
+
+        if summary["labels"]:
+            print(f"\n{'label':<24}{'calls':>12}", file=stream)
+            for row in summary["labels"]:
+                print(f"{row['label']:<24}{row['calls']:>12}", file=stream)
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+            file.write("\n")
@@ -0,0 +1,106 @@
+import locale
+from error import Error, exit_with_error
+from instruction import Nil
+
+
+class StreamReader:
+    cache_size = 4096
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.cache = {}
+
+    def readline(self):
+        val = self.stream.readline()
+
+        if val == "":
+            return None
+
+        return val.rstrip('\n')
+
+    def close(self):
+        self.stream.close()
+
+    def read(self, _type):
+        val = self.readline()
+
+        if val is None:
+            return Nil()
+
+        if _type != "int" and _type != "bool":
+            return self.parse(val, _type)
+
+        key = (_type, val)
+        if key in self.cache:
+            return self.cache[key]
+
+        val = self.parse(val, _type)
+
+        if len(self.cache) < self.cache_size:
+            self.cache[key] = val
+
+        return val
+
+    def parse(self, val, _type):
+        if val == "" and _type != "string":
+            return Nil()
+
+        if _type == "int":
+            try:
+                return int(val, 0)
+            except ValueError:
+                return Nil()
+
+        if _type == "bool":
+            return val.lower() == "true"
+
+        if _type == "float":
+            try:
+                return float.fromhex(val)
+            except ValueError:
+                return Nil()
+
+        if _type == "nil":
+            exit_with_error(Error.InvalidOperands)
+
+        return val
+
+
+class FileReader(StreamReader):
+    def __init__(self, path):
+        super().__init__(None)
+
+        with open(path, "rb") as file:
+            data = file.read()
+
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        self.lines = data.split(b"\n")
+        if self.lines[-1] == b"":
+            self.lines.pop()
+
+        self.encoding = locale.getpreferredencoding(False)
+        self.position = 0
+
+    def read(self, _type):
+        if self.position >= len(self.lines):
+            return Nil()
+
+        line = self.lines[self.position]
+        self.position += 1
+
+        # Conversions are cached on the raw line, so repeated int/bool
+        # values skip both decoding and parsing.
+        key = (_type, line)
+        if key in self.cache:
+            return self.cache[key]
+
+        val = self.parse(line.decode(self.encoding), _type)
+
+        if (_type == "int" or _type == "bool") and len(self.cache) < self.cache_size:
+            self.cache[key] = val
+
+        return val
+
+    def close(self):
+        self.lines = []
@@ -2,39 +2,54 @@ from collections import deque
 from instruction import InstructionFactory
 from error import Error
 from instruction import *
-from os import environ
 import os
-from frame import Frame, FrameHolder
+from frame import Frame, FrameHolder, FrameLayout
+from output import OutputBuffer
+from reader import FileReader, StreamReader
+from time import perf_counter
 
 
 class Runtime:
-    _instance = None
+    def __init__(self, output_buffer=8192):
+        local_layout = FrameLayout()
+        self.layouts = {
+            "GF": FrameLayout(),
+            "LF": local_layout,
+            "TF": local_layout,
+        }
 
-    def __init__(self, input):
-        if not self._is_initialized:
+        self.labels = {}
+        self.has_breaks = False
+        self.budget = None
+        self.memo = None
 
-            self.frames = FrameHolder()
+        self.output_buffer = output_buffer
+        self.input = None
 
-            self.labels = {}
+        self.reset()
 
-            self.call_stack = deque()
-            self.data_stack = deque()
+    def reset(self, stream=sys.stdout, errors=None):
+        self.frames = FrameHolder(self.layouts)
 
-            self.instruction_pointer = 0
-            if input == "stdin":
-                self.input = sys.stdin
-            else:
-                try:
-                    self.input = open(input, "r")
-                except:
-                    exit_with_error(Error.InvalidFile)
+        self.call_stack = deque()
+        self.data_stack = deque()
+
+        self.instruction_pointer = 0
+        self.executed = 0
+        self.started = perf_counter()
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(Runtime, cls).__new__(cls)
-            cls._instance._is_initialized = False
+        if self.budget is not None:
+            self.budget.reset()
+        if self.memo is not None:
+            self.memo.reset()
 
-        return cls._instance
+        self.output = OutputBuffer(stream, self.output_buffer)
+        self.diagnostics = OutputBuffer(
+            sys.stderr if errors is None else errors, self.output_buffer)
+
+    def flush(self):
+        self.output.flush()
+        self.diagnostics.flush()
 
     def __del__(self):
         try:
@@ -42,15 +57,132 @@ class Runtime:
         except AttributeError:
             pass
 
-    def run(self, instructions):
+    def open_input(self, input):
+        if input == "stdin":
+            self.input = StreamReader(sys.stdin)
+        else:
+            try:
+                self.input = FileReader(input)
+            except OSError:
+                exit_with_error(Error.InvalidFile)
+
+    def read(self, _type):
+        self.output.flush()
+
+        return self.input.read(_type)
+
+    def write(self, val):
+        if type(val) is Nil:
+            val = ""
+        elif type(val) is bool:
+            val = str(val).lower()
+        elif type(val) is float:
+            val = format_float(val)
+
+        self.output.write(str(val))
+
+    def dprint(self, val):
+        if type(val) is Nil:
+            val = ""
+        elif type(val) is bool:
+            val = str(val).lower()
+        elif type(val) is float:
+            val = format_float(val)
+
+        self.diagnostics.write(f"{val}\n")
+
+    def dump_state(self, ip, order, frames):
+        elapsed = perf_counter() - self.started
+
+        # Flush program output first so the dump lines up with it.
+        self.output.flush()
+
+        self.diagnostics.write(
+            f"BREAK at order {order} (ip {ip}): {self.executed} instructions executed, "
+            f"{elapsed * 1000:.3f}ms elapsed\n"
+            f"  GF: {frames['GF']}\n"
+            f"  LF: {frames['LF']}\n"
+            f"  TF: {frames['TF']}\n"
+            f"  data stack: {len(self.data_stack)}, call stack: {len(self.call_stack)}\n")
+        self.diagnostics.flush()
+
+    def link(self, instructions):
         for idx, instruction in enumerate(instructions):
+            if isinstance(instruction, Break):
+                self.has_breaks = True
+
             if isinstance(instruction, Label):
-                if instruction.element[0].text in self.labels:
+                if instruction.args[0] in self.labels:
                     exit_with_error(Error.InvalidSemantics)
-                self.labels[instruction.element[0].text] = idx
+                self.labels[instruction.args[0]] = idx
+
+        for instruction in instructions:
+            instruction.link(self.labels)
+
+    def run(self, instructions):
+        try:
+            if not self.has_breaks:
+                while (self.instruction_pointer < len(instructions)):
+                    instructions[self.instruction_pointer].execute()
+                    self.instruction_pointer += 1
+            else:
+                # Only programs with a BREAK pay for counting.
+                while (self.instruction_pointer < len(instructions)):
+                    self.executed += 1
+
+                    instructions[self.instruction_pointer].execute()
+                    self.instruction_pointer += 1
+        finally:
+            self.flush()
+
+    def trace(self, instructions, tracer):
+        tracer.attach(self.dump_frames)
+
+        try:
+            while (self.instruction_pointer < len(instructions)):
+                ip = self.instruction_pointer
+                self.executed += 1
+                instructions[ip].execute()
+                tracer.step(ip)
+                self.instruction_pointer += 1
+        except SystemExit as error:
+            if error.code:
+                tracer.error(error.code, ip)
+            raise
+        finally:
+            self.flush()
+            tracer.close()
+
+    def dump_frames(self):
+        return str(self.frames)
+
+    def held_values(self):
+        frames = self.frames.collection
+
+        yield frames["GF"].collection
+        for frame in frames["LF"].collection:
+            yield frame.collection
+        if frames["TF"] is not None:
+            yield frames["TF"].collection
+        yield self.data_stack
+
+    def profile(self, instructions, profiler):
+        counts = profiler.counts
+        times = profiler.times
+        local_frames = self.frames.collection["LF"].collection
+
+        try:
+            while (self.instruction_pointer < len(instructions)):
+                ip = self.instruction_pointer
+                counts[ip] += 1
+                self.executed += 1
+
+                start = perf_counter()
+                instructions[ip].execute()
+                times[ip] += perf_counter() - start
 
-        while (self.instruction_pointer < len(instructions)):
-            instructions[self.instruction_pointer].execute()
-            self.instruction_pointer += 1
-            if environ.get("DEBUG") == "1":
-                print(self.frames)
+                profiler.observe(
+                    len(self.data_stack), len(self.call_stack), len(local_frames))
+                self.instruction_pointer += 1
+        finally:
+            self.flush()
@@ -0,0 +1,117 @@
+from instruction import *
+
+
+VARIANTS = {
+    Add: (AddVarVar, AddVarConst),
+    Sub: (SubVarVar, SubVarConst),
+    Mul: (MulVarVar, MulVarConst),
+    Lt: (LtVarVar, LtVarConst),
+    Gt: (GtVarVar, GtVarConst),
+    Eq: (EqVarVar, EqVarConst),
+    JumpIfEq: (JumpIfEqVarVar, JumpIfEqVarConst),
+    JumpIfNeq: (JumpIfNeqVarVar, JumpIfNeqVarConst),
+}
+
+ARITHMETIC = {
+    Add: lambda x, y: x + y,
+    Sub: lambda x, y: x - y,
+    Mul: lambda x, y: x * y,
+}
+
+RELATIONAL = {
+    Lt: lambda x, y: x < y,
+    Gt: lambda x, y: x > y,
+    Eq: lambda x, y: x == y,
+    JumpIfEq: lambda x, y: x == y,
+    JumpIfNeq: lambda x, y: x != y,
+}
+
+
+def valid(instruction_class, arg2, arg3):
+    # Whether the generic handler would accept these operand types.
+    if instruction_class in ARITHMETIC:
+        return type(arg2) is type(arg3) and (type(arg2) is int or type(arg2) is float)
+
+    if instruction_class is Lt or instruction_class is Gt:
+        return type(arg2) is type(arg3) and type(arg2) is not Nil
+
+    return type(arg2) is type(arg3) or type(arg2) is Nil or type(arg3) is Nil
+
+
+class Specializer:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.counts = {}
+
+    def specialize(self, instructions):
+        return [self.specialize_instruction(instruction) for instruction in instructions]
+
+    def specialize_instruction(self, instruction):
+        instruction_class = type(instruction)
+        if instruction_class not in VARIANTS:
+            return instruction
+
+        arg1, arg2, arg3 = instruction.args
+        variable2 = type(arg2) is Variable
+        variable3 = type(arg3) is Variable
+
+        if not variable2 and not variable3:
+            variant = self.fold(instruction_class, arg1, arg2, arg3)
+        elif variable2 and variable3:
+            variant = VARIANTS[instruction_class][0], (arg1, arg2, arg3)
+        else:
+            variant = self.var_const(instruction_class, arg1, arg2, arg3, variable2)
+
+        if variant is None:
+            return instruction
+
+        variant_class, args = variant
+        self.counts[variant_class] = self.counts.get(variant_class, 0) + 1
+
+        return variant_class.restore(args, self.runtime, instruction.order)
+
+    def var_const(self, instruction_class, arg1, arg2, arg3, variable2):
+        const = arg3 if variable2 else arg2
+
+        # A constant the handler can never accept keeps the generic form,
+        # so the error is still raised at run time.
+        if type(const) is Nil:
+            return None
+        if instruction_class in ARITHMETIC and type(const) is not int and type(const) is not float:
+            return None
+
+        if not variable2:
+            # Only operands that commute can be swapped without changing
+            # the result.
+            if instruction_class is Sub or instruction_class is Lt or instruction_class is Gt:
+                return None
+            arg2, arg3 = arg3, arg2
+
+        return VARIANTS[instruction_class][1], (arg1, arg2, arg3)
+
+    def fold(self, instruction_class, arg1, arg2, arg3):
+        if not valid(instruction_class, arg2, arg3):
+            return None
+
+        if instruction_class in ARITHMETIC:
+            return Move, (arg1, ARITHMETIC[instruction_class](arg2, arg3))
+
+        if instruction_class is JumpIfEq or instruction_class is JumpIfNeq:
+            if RELATIONAL[instruction_class](arg2, arg3):
+                return Jump, (arg1,)
+            return Nop, ()
+
+        return Move, (arg1, RELATIONAL[instruction_class](arg2, arg3))
+
+    def report(self, stream):
+        names = {
+            instruction_class: opcode
+            for opcode, instruction_class in InstructionFactory.specialized_dict.items()
+        }
+        names.update({Move: "MOVE", Jump: "JUMP"})
+
+        variants = ", ".join(
+            f"{names[variant_class]} {count}" for variant_class, count in self.counts.items())
+        print(f"specialized: {sum(self.counts.values())} instructions"
+              + (f" ({variants})" if variants else ""),
+              file=stream)
@@ -0,0 +1,54 @@
+class StringBuffer:
+    # Mutable string kept in a frame slot by CONCAT onto the same variable
+    # and SETCHAR. It never leaves the slot: any other read materializes
+    # it to a str, which keeps copy semantics for MOVE, PUSHS and friends.
+    #
+    # Appends go to a list of chunks joined on the next read, the joined
+    # str replaces them. SETCHAR switches it to a list of chars, which
+    # costs a pointer per character, so a large append switches it back.
+    # With chars the chunks hold only the joined str, None once stale.
+    __slots__ = ("chunks", "chars", "length")
+
+    def __init__(self, text):
+        self.chunks = [text]
+        self.chars = None
+        self.length = len(text)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        if self.chars is not None:
+            return self.chars[idx]
+
+        return str(self)[idx]
+
+    def __str__(self):
+        if self.chunks is None:
+            self.chunks = ["".join(self.chars)]
+        elif len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+
+        return self.chunks[0]
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def append(self, text):
+        self.length += len(text)
+
+        if self.chars is None:
+            self.chunks.append(text)
+        elif len(text) < len(self.chars):
+            self.chars.extend(text)
+            self.chunks = None
+        else:
+            self.chunks = ["".join(self.chars), text]
+            self.chars = None
+
+    def setchar(self, idx, char):
+        if self.chars is None:
+            self.chars = list(str(self))
+
+        self.chars[idx] = char
+        self.chunks = None
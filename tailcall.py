@@ -0,0 +1,167 @@
+from instruction import *
+
+
+class TailCallEliminator:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.counts = {"CALL RETURN": 0, "CALL POPFRAME RETURN": 0}
+
+    def eliminate(self, instructions):
+        # The CALL is replaced in place and the rest of the sequence stays,
+        # nothing returns to it any more but labels keep their indices.
+        frames_free = self.tf_dead_after_calls(instructions)
+        balanced = self.balanced_functions(instructions) if frames_free else set()
+        eliminated = list(instructions)
+
+        for idx, instruction in enumerate(instructions):
+            if type(instruction) is not Call or idx + 1 >= len(instructions):
+                continue
+
+            following = type(instructions[idx + 1])
+            if following is Return:
+                # The callee's RETURN goes straight to our caller.
+                eliminated[idx] = TailJump.restore(instruction.args, self.runtime, instruction.order)
+                self.counts["CALL RETURN"] += 1
+            elif (following is PopFrame and frames_free
+                  and idx + 2 < len(instructions) and type(instructions[idx + 2]) is Return
+                  and instruction.args[0] in balanced):
+                eliminated[idx] = TailCall.restore(instruction.args, self.runtime, instruction.order)
+                self.counts["CALL POPFRAME RETURN"] += 1
+
+        return eliminated
+
+    def balanced_functions(self, instructions):
+        # The caller's frame is dropped before the callee runs instead of
+        # after, which leaves the same frames behind only if the callee
+        # never sees it. That holds for the shape memo.py requires: the
+        # callee pushes a frame on entry, before reading LF, and pops
+        # exactly that one on every way out. Everything it calls has to
+        # be balanced too, so callers of an unbalanced function are
+        # dropped until nothing changes.
+        targets = dict.fromkeys(
+            instruction.args[0] for instruction in instructions if isinstance(instruction, Call))
+
+        callers = {target: set() for target in targets}
+        balanced = set()
+        pending = []
+        for target in targets:
+            callees = self.frame_callees(instructions, target)
+            if callees is None:
+                pending.append(target)
+                continue
+
+            balanced.add(target)
+            for callee in callees:
+                callers[callee].add(target)
+
+        while pending:
+            target = pending.pop()
+            for caller in callers[target]:
+                if caller in balanced:
+                    balanced.discard(caller)
+                    pending.append(caller)
+
+        return balanced
+
+    def frame_callees(self, instructions, label):
+        # Returns the functions called on the way, or None when the frames
+        # are not balanced. CREATEFRAME is allowed after entry, it only
+        # replaces TF, which tf_dead_after_calls covers.
+        if label + 1 < len(instructions) and type(instructions[label + 1]) is PushFrame:
+            start = label + 2
+        elif (label + 2 < len(instructions) and type(instructions[label + 1]) is CreateFrame
+              and type(instructions[label + 2]) is PushFrame):
+            start = label + 3
+        else:
+            return None
+
+        callees = set()
+        pending = [start]
+        visited = set()
+
+        while pending:
+            idx = pending.pop()
+            if idx in visited:
+                continue
+            visited.add(idx)
+
+            if idx >= len(instructions):
+                return None
+
+            instruction = instructions[idx]
+            instruction_class = type(instruction)
+
+            if instruction_class is PopFrame:
+                if idx + 1 >= len(instructions) or type(instructions[idx + 1]) is not Return:
+                    return None
+                continue
+
+            if instruction_class in (PushFrame, Return, Break):
+                return None
+            if instruction_class is Exit:
+                continue
+
+            if isinstance(instruction, Call):
+                callees.add(instruction.args[0])
+                pending.append(idx + 1)
+            elif instruction_class is Jump:
+                pending.append(instruction.args[0])
+            elif "label" in instruction.operands and instruction_class is not Label:
+                pending.extend((instruction.args[0], idx + 1))
+            else:
+                pending.append(idx + 1)
+
+        return callees
+
+    def entry(self, instructions, label):
+        return type(instructions[label + 1]) if label + 1 < len(instructions) else None
+
+    def tf_dead_after_calls(self, instructions):
+        # After a tail call the caller finds the callee's frame in TF, not
+        # the one POPFRAME would have left there. That is only invisible if
+        # no code after any CALL reads TF before replacing it. RETURN hands
+        # TF on to another such place, which is checked as well.
+        for idx, instruction in enumerate(instructions):
+            if isinstance(instruction, Call) and not self.tf_dead(instructions, idx + 1):
+                return False
+
+        return True
+
+    def tf_dead(self, instructions, start):
+        pending = [start]
+        visited = set()
+
+        while pending:
+            idx = pending.pop()
+            if idx >= len(instructions) or idx in visited:
+                continue
+            visited.add(idx)
+
+            instruction = instructions[idx]
+            instruction_class = type(instruction)
+
+            if instruction_class in (CreateFrame, PopFrame, Return, Exit):
+                continue
+
+            if instruction_class in (PushFrame, Break):
+                return False
+            if any(type(arg) is Variable and arg.frame == "TF" for arg in instruction.args):
+                return False
+
+            if isinstance(instruction, Call):
+                if self.entry(instructions, instruction.args[0]) is not CreateFrame:
+                    return False
+                continue
+
+            if instruction_class is Jump:
+                pending.append(instruction.args[0])
+            elif "label" in instruction.operands and instruction_class is not Label:
+                pending.extend((instruction.args[0], idx + 1))
+            else:
+                pending.append(idx + 1)
+
+        return True
+
+    def report(self, stream):
+        counts = ", ".join(f"{pattern} {count}" for pattern, count in self.counts.items())
+        print(f"tail calls: {sum(self.counts.values())} ({counts})", file=stream)
@@ -0,0 +1,69 @@
+from collections import deque
+from cache import OPCODES
+from instruction import Variable
+
+
+class Tracer:
+    def __init__(self, instructions, stream):
+        self.instructions = instructions
+        self.stream = stream
+        self.steps = 0
+        self.dump_frames = None
+
+    def attach(self, dump_frames):
+        self.dump_frames = dump_frames
+
+    def step(self, ip):
+        pass
+
+    def error(self, code, ip):
+        pass
+
+    def close(self):
+        self.stream.flush()
+
+    def describe(self, step, ip):
+        instruction = self.instructions[ip]
+        args = " ".join(
+            f"{arg.frame}@{arg.name}" if type(arg) is Variable else repr(arg)
+            for arg in instruction.args
+        )
+
+        return f"{step:>10} {instruction.order:>6} {OPCODES[type(instruction)]} {args}".rstrip()
+
+
+class FrameDumper(Tracer):
+    def step(self, ip):
+        self.stream.write(f"{self.dump_frames()}\n")
+
+
+class InstructionTracer(Tracer):
+    def __init__(self, instructions, stream, sample=1):
+        super().__init__(instructions, stream)
+        self.sample = sample
+
+    def step(self, ip):
+        self.steps += 1
+        if self.steps % self.sample == 0:
+            self.stream.write(self.describe(self.steps, ip) + "\n")
+
+
+class RingTracer(Tracer):
+    def __init__(self, instructions, stream, size=64):
+        super().__init__(instructions, stream)
+        self.ring = deque(maxlen=size)
+
+    def step(self, ip):
+        self.steps += 1
+        self.ring.append((self.steps, ip))
+
+    def error(self, code, ip):
+        # The failing instruction never reaches step(), add it here.
+        self.steps += 1
+        self.ring.append((self.steps, ip))
+
+        self.stream.write(f"error {code}, last {len(self.ring)} steps:\n")
+        for step, ip in self.ring:
+            self.stream.write(self.describe(step, ip) + "\n")
+
+        self.stream.write(f"frames: {self.dump_frames()}\n")
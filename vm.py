@@ -0,0 +1,1044 @@
+import sys
+from time import perf_counter
+from compiler import OPCODES, GF, LF, TF
+from error import Error, exit_with_error
+from frame import Undefined
+from instruction import Nil, float_operands
+from string_buffer import StringBuffer
+
+
+class VirtualMachine:
+    def __init__(self, program, runtime):
+        self.program = program
+        self.runtime = runtime
+
+        self.global_size = len(runtime.layouts["GF"])
+        self.local_size = len(runtime.layouts["LF"])
+
+        self.frames = [[Undefined] * self.global_size, None, None, program.constants]
+        self.local_frames = []
+        self.data_stack = runtime.data_stack
+
+        self.handlers = [getattr(self, f"op_{name.lower()}") for name in OPCODES]
+
+    def run(self):
+        code = self.program.code
+        operands = self.program.operands
+        handlers = self.handlers
+        end = len(code)
+
+        runtime = self.runtime
+
+        ip = 0
+        try:
+            if not runtime.has_breaks:
+                while ip < end:
+                    ip = handlers[code[ip]](operands[ip], ip)
+            else:
+                while ip < end:
+                    runtime.executed += 1
+
+                    ip = handlers[code[ip]](operands[ip], ip)
+        finally:
+            runtime.instruction_pointer = ip
+            runtime.flush()
+
+    def trace(self, tracer):
+        code = self.program.code
+        operands = self.program.operands
+        handlers = self.handlers
+        end = len(code)
+
+        tracer.attach(self.dump_frames)
+
+        ip = 0
+        try:
+            while ip < end:
+                self.runtime.executed += 1
+                next_ip = handlers[code[ip]](operands[ip], ip)
+                tracer.step(ip)
+                ip = next_ip
+        except SystemExit as error:
+            if error.code:
+                tracer.error(error.code, ip)
+            raise
+        finally:
+            self.runtime.instruction_pointer = ip
+            self.runtime.flush()
+            tracer.close()
+
+    def dump_frames(self):
+        return str(self.named_frames())
+
+    def named_frames(self):
+        return {
+            "GF": self.named(self.frames[GF], "GF"),
+            "LF": [self.named(frame, "LF") for frame in self.local_frames],
+            "TF": self.named(self.frames[TF], "TF"),
+        }
+
+    def named(self, frame, frame_id):
+        if frame is None:
+            return None
+
+        return {
+            name: val
+            for name, val in zip(self.runtime.layouts[frame_id].names, frame)
+            if val is not Undefined
+        }
+
+    def profile(self, profiler):
+        code = self.program.code
+        operands = self.program.operands
+        handlers = self.handlers
+        end = len(code)
+
+        counts = profiler.counts
+        times = profiler.times
+        data_stack = self.runtime.data_stack
+        call_stack = self.runtime.call_stack
+        local_frames = self.local_frames
+
+        ip = 0
+        try:
+            while ip < end:
+                counts[ip] += 1
+                self.runtime.executed += 1
+
+                start = perf_counter()
+                next_ip = handlers[code[ip]](operands[ip], ip)
+                times[ip] += perf_counter() - start
+
+                profiler.observe(len(data_stack), len(call_stack), len(local_frames))
+                ip = next_ip
+        finally:
+            self.runtime.instruction_pointer = ip
+            self.runtime.flush()
+
+    def held_values(self):
+        yield self.frames[GF]
+        yield from self.local_frames
+        if self.frames[TF] is not None:
+            yield self.frames[TF]
+        yield self.data_stack
+
+    def load(self, ref):
+        frame = self.frames[ref[0]]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        val = frame[ref[1]]
+
+        if val is Undefined:
+            exit_with_error(Error.InvalidVariable)
+
+        if val is None:
+            exit_with_error(Error.MissingValue)
+
+        if type(val) is StringBuffer:
+            return str(val)
+
+        return val
+
+    def load_raw(self, ref):
+        frame = self.frames[ref[0]]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        val = frame[ref[1]]
+
+        if val is Undefined:
+            exit_with_error(Error.InvalidVariable)
+
+        if val is None:
+            exit_with_error(Error.MissingValue)
+
+        return val
+
+    def store(self, ref, val):
+        frame = self.frames[ref[0]]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        if frame[ref[1]] is Undefined:
+            exit_with_error(Error.InvalidVariable)
+
+        frame[ref[1]] = val
+
+    def op_move(self, args, ip):
+        self.store(args[0], self.load(args[1]))
+        return ip + 1
+
+    def op_createframe(self, args, ip):
+        self.frames[TF] = [Undefined] * self.local_size
+        return ip + 1
+
+    def op_pushframe(self, args, ip):
+        frame = self.frames[TF]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        self.local_frames.append(frame)
+        self.frames[LF] = frame
+        self.frames[TF] = None
+        return ip + 1
+
+    def op_popframe(self, args, ip):
+        if not self.local_frames:
+            exit_with_error(Error.InvalidFrame)
+
+        self.frames[TF] = self.local_frames.pop()
+        self.frames[LF] = self.local_frames[-1] if self.local_frames else None
+        return ip + 1
+
+    def op_defvar(self, args, ip):
+        frame = self.frames[args[0][0]]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        if frame[args[0][1]] is not Undefined:
+            exit_with_error(Error.InvalidSemantics)
+
+        frame[args[0][1]] = None
+        return ip + 1
+
+    def op_call(self, args, ip):
+        self.runtime.call_stack.append(ip)
+        return args[0]
+
+    def op_return(self, args, ip):
+        if not self.runtime.call_stack:
+            sys.exit(Error.MissingValue)
+        return self.runtime.call_stack.pop() + 1
+
+    def op_pushs(self, args, ip):
+        self.data_stack.append(self.load(args[0]))
+        return ip + 1
+
+    def op_pops(self, args, ip):
+        if not self.data_stack:
+            exit_with_error(Error.MissingValue)
+
+        self.store(args[0], self.data_stack.pop())
+        return ip + 1
+
+    def op_add(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 + arg3)
+        return ip + 1
+
+    def op_sub(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 - arg3)
+        return ip + 1
+
+    def op_mul(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 * arg3)
+        return ip + 1
+
+    def op_idiv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        self.store(args[0], arg2 // arg3)
+        return ip + 1
+
+    def op_div(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        float_operands(arg2, arg3)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        self.store(args[0], arg2 / arg3)
+        return ip + 1
+
+    def op_lt(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 < arg3)
+        return ip + 1
+
+    def op_gt(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 > arg3)
+        return ip + 1
+
+    def op_eq(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 == arg3)
+        return ip + 1
+
+    def op_and(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 and arg3)
+        return ip + 1
+
+    def op_or(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 or arg3)
+        return ip + 1
+
+    def op_not(self, args, ip):
+        arg2 = self.load(args[1])
+
+        if type(arg2) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], not arg2)
+        return ip + 1
+
+    def op_int2char(self, args, ip):
+        arg2 = self.load(args[1])
+
+        if type(arg2) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            val = chr(arg2)
+        except ValueError:
+            exit_with_error(Error.InvalidStringOperation)
+
+        self.store(args[0], val)
+        return ip + 1
+
+    def op_stri2int(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not str or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 >= len(arg2) or arg3 < 0:
+            exit_with_error(Error.InvalidStringOperation)
+
+        self.store(args[0], ord(arg2[arg3]))
+        return ip + 1
+
+    def op_int2float(self, args, ip):
+        arg2 = self.load(args[1])
+
+        if type(arg2) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], float(arg2))
+        return ip + 1
+
+    def op_float2int(self, args, ip):
+        arg2 = self.load(args[1])
+
+        if type(arg2) is not float:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            val = int(arg2)
+        except (OverflowError, ValueError):
+            exit_with_error(Error.InvalidOperandValue)
+
+        self.store(args[0], val)
+        return ip + 1
+
+    def op_read(self, args, ip):
+        self.store(args[0], self.runtime.read(args[1]))
+        return ip + 1
+
+    def op_write(self, args, ip):
+        self.runtime.write(self.load(args[0]))
+        return ip + 1
+
+    def op_concat(self, args, ip):
+        appending = args[1] == args[0]
+        arg2 = self.load_raw(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is StringBuffer and type(arg3) is str:
+            if appending:
+                arg2.append(arg3)
+                return ip + 1
+
+            arg2 = str(arg2)
+
+        if type(arg2) is not str or type(arg3) is not str:
+            exit_with_error(Error.InvalidOperands)
+
+        if appending:
+            val = StringBuffer(arg2)
+            val.append(arg3)
+        else:
+            val = arg2 + arg3
+
+        self.store(args[0], val)
+        return ip + 1
+
+    def op_strlen(self, args, ip):
+        arg2 = self.load_raw(args[1])
+
+        if type(arg2) is not str and type(arg2) is not StringBuffer:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], len(arg2))
+        return ip + 1
+
+    def op_getchar(self, args, ip):
+        arg2 = self.load_raw(args[1])
+        arg3 = self.load(args[2])
+
+        if (type(arg2) is not str and type(arg2) is not StringBuffer) or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 >= len(arg2) or arg3 < 0:
+            exit_with_error(Error.InvalidStringOperation)
+
+        self.store(args[0], arg2[arg3])
+        return ip + 1
+
+    def op_setchar(self, args, ip):
+        val = self.load_raw(args[0])
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if (type(val) is not str and type(val) is not StringBuffer) or type(arg2) is not int or type(arg3) is not str:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 >= len(val) or arg2 < 0:
+            exit_with_error(Error.InvalidStringOperation)
+
+        if arg3 == "":
+            exit_with_error(Error.InvalidStringOperation)
+
+        if type(val) is str:
+            val = StringBuffer(val)
+            self.store(args[0], val)
+
+        val.setchar(arg2, arg3[0])
+        return ip + 1
+
+    def op_type(self, args, ip):
+        frame = self.frames[args[1][0]]
+        if frame is None:
+            exit_with_error(Error.InvalidFrame)
+
+        arg2 = frame[args[1][1]]
+
+        if arg2 is Undefined:
+            exit_with_error(Error.InvalidVariable)
+
+        if arg2 is None:
+            val = ""
+        elif type(arg2) is int:
+            val = "int"
+        elif type(arg2) is bool:
+            val = "bool"
+        elif type(arg2) is str or type(arg2) is StringBuffer:
+            val = "string"
+        elif type(arg2) is float:
+            val = "float"
+        else:
+            val = "nil"
+
+        self.store(args[0], val)
+        return ip + 1
+
+    def op_label(self, args, ip):
+        return ip + 1
+
+    def op_jump(self, args, ip):
+        return args[0]
+
+    def op_jumpifeq(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            return args[0]
+        return ip + 1
+
+    def op_jumpifneq(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            return args[0]
+        return ip + 1
+
+    def op_exit(self, args, ip):
+        arg1 = self.load(args[0])
+
+        if type(arg1) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg1 < 0 or arg1 > 49:
+            exit_with_error(Error.InvalidOperandValue)
+
+        sys.exit(arg1)
+
+    def op_dprint(self, args, ip):
+        self.runtime.dprint(self.load(args[0]))
+        return ip + 1
+
+    def op_break(self, args, ip):
+        self.runtime.dump_state(ip, self.program.orders[ip], self.named_frames())
+        return ip + 1
+
+    def op_clears(self, args, ip):
+        self.data_stack.clear()
+        return ip + 1
+
+    def op_adds(self, args, ip):
+        # The result overwrites the second operand in place, one pop and
+        # one store instead of two pops and a push.
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        stack[-1] = arg2 + arg3
+        return ip + 1
+
+    def op_subs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        stack[-1] = arg2 - arg3
+        return ip + 1
+
+    def op_muls(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        stack[-1] = arg2 * arg3
+        return ip + 1
+
+    def op_idivs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not int or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        stack[-1] = arg2 // arg3
+        return ip + 1
+
+    def op_divs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        float_operands(arg2, arg3)
+
+        if arg3 == 0:
+            exit_with_error(Error.InvalidOperandValue)
+
+        stack[-1] = arg2 / arg3
+        return ip + 1
+
+    def op_int2floats(self, args, ip):
+        stack = self.data_stack
+        if not stack:
+            exit_with_error(Error.MissingValue)
+
+        if type(stack[-1]) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = float(stack[-1])
+        return ip + 1
+
+    def op_float2ints(self, args, ip):
+        stack = self.data_stack
+        if not stack:
+            exit_with_error(Error.MissingValue)
+
+        if type(stack[-1]) is not float:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            stack[-1] = int(stack[-1])
+        except (OverflowError, ValueError):
+            exit_with_error(Error.InvalidOperandValue)
+
+        return ip + 1
+
+    def op_lts(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = arg2 < arg3
+        return ip + 1
+
+    def op_gts(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = arg2 > arg3
+        return ip + 1
+
+    def op_eqs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = arg2 == arg3
+        return ip + 1
+
+    def op_ands(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = arg2 and arg3
+        return ip + 1
+
+    def op_ors(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not bool or type(arg3) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = arg2 or arg3
+        return ip + 1
+
+    def op_nots(self, args, ip):
+        stack = self.data_stack
+        if not stack:
+            exit_with_error(Error.MissingValue)
+
+        if type(stack[-1]) is not bool:
+            exit_with_error(Error.InvalidOperands)
+
+        stack[-1] = not stack[-1]
+        return ip + 1
+
+    def op_int2chars(self, args, ip):
+        stack = self.data_stack
+        if not stack:
+            exit_with_error(Error.MissingValue)
+
+        if type(stack[-1]) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        try:
+            stack[-1] = chr(stack[-1])
+        except ValueError:
+            exit_with_error(Error.InvalidStringOperation)
+
+        return ip + 1
+
+    def op_stri2ints(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack[-1]
+
+        if type(arg2) is not str or type(arg3) is not int:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg3 >= len(arg2) or arg3 < 0:
+            exit_with_error(Error.InvalidStringOperation)
+
+        stack[-1] = ord(arg2[arg3])
+        return ip + 1
+
+    def op_jumpifeqs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack.pop()
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            return args[0]
+        return ip + 1
+
+    def op_jumpifneqs(self, args, ip):
+        stack = self.data_stack
+        if len(stack) < 2:
+            exit_with_error(Error.MissingValue)
+
+        arg3 = stack.pop()
+        arg2 = stack.pop()
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            return args[0]
+        return ip + 1
+
+    # Specialized variants, see the classes of the same name in
+    # instruction.py. The VarConst forms get their constant unlowered.
+
+    def op_add_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 + arg3)
+        return ip + 1
+
+    def op_add_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 + arg3)
+        return ip + 1
+
+    def op_sub_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 - arg3)
+        return ip + 1
+
+    def op_sub_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 - arg3)
+        return ip + 1
+
+    def op_mul_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not int or type(arg3) is not int:
+            float_operands(arg2, arg3)
+
+        self.store(args[0], arg2 * arg3)
+        return ip + 1
+
+    def op_mul_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 * arg3)
+        return ip + 1
+
+    def op_lt_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 < arg3)
+        return ip + 1
+
+    def op_lt_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 < arg3)
+        return ip + 1
+
+    def op_gt_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) or type(arg2) is Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 > arg3)
+        return ip + 1
+
+    def op_gt_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 > arg3)
+        return ip + 1
+
+    def op_eq_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 == arg3)
+        return ip + 1
+
+    def op_eq_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        self.store(args[0], arg2 == arg3)
+        return ip + 1
+
+    def op_jumpifeq_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            return args[0]
+        return ip + 1
+
+    def op_jumpifeq_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 == arg3:
+            return args[0]
+        return ip + 1
+
+    def op_jumpifneq_vv(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = self.load(args[2])
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil and type(arg3) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            return args[0]
+        return ip + 1
+
+    def op_jumpifneq_vc(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3) and type(arg2) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if arg2 != arg3:
+            return args[0]
+        return ip + 1
+
+    def op_nop(self, args, ip):
+        return ip + 1
+
+    def op_add_jumpifneq(self, args, ip):
+        arg2 = self.load(args[1])
+        arg3 = args[2]
+
+        if type(arg2) is not type(arg3):
+            exit_with_error(Error.InvalidOperands)
+
+        val = arg2 + arg3
+        self.store(args[0], val)
+
+        limit = self.load(args[4])
+        if type(val) is not type(limit) and type(limit) is not Nil:
+            exit_with_error(Error.InvalidOperands)
+
+        if val != limit:
+            return args[3]
+        return ip + 2
+
+    def op_prologue(self, args, ip):
+        frame = [Undefined] * self.local_size
+        for _, slot in args[0]:
+            frame[slot] = None
+
+        self.local_frames.append(frame)
+        self.frames[LF] = frame
+        self.frames[TF] = None
+        return ip + len(args[0]) + 2
+
+    def op_epilogue(self, args, ip):
+        if not self.local_frames:
+            exit_with_error(Error.InvalidFrame)
+
+        self.frames[TF] = self.local_frames.pop()
+        self.frames[LF] = self.local_frames[-1] if self.local_frames else None
+
+        if not self.runtime.call_stack:
+            sys.exit(Error.MissingValue)
+        return self.runtime.call_stack.pop() + 1
+
+    def op_pushs_call(self, args, ip):
+        for symbol in args[0]:
+            self.data_stack.append(self.load(symbol))
+
+        self.runtime.call_stack.append(ip + len(args[0]))
+        return args[1]
+
+    def op_checkpoint(self, args, ip):
+        budget = self.runtime.budget
+        budget.spent += args[1]
+        budget.countdown -= 1
+
+        if not budget.countdown:
+            budget.check(
+                len(self.runtime.call_stack), len(self.local_frames),
+                len(self.data_stack), self.held_values)
+        return ip + 1
+
+    def op_concat_bounded(self, args, ip):
+        self.runtime.budget.check_concat(self.load_raw(args[1]), self.load_raw(args[2]))
+        return self.op_concat(args, ip)
+
+    def op_memo_call(self, args, ip):
+        arity, results = args[1]
+
+        entry = self.runtime.memo.call(
+            args[0], arity, results, self.data_stack, len(self.runtime.call_stack) + 1)
+        if entry is not None:
+            self.frames[TF] = list(entry[1])
+            return ip + 1
+
+        self.runtime.call_stack.append(ip)
+        return args[0]
+
+    def op_memo_return(self, args, ip):
+        self.runtime.memo.returning(len(self.runtime.call_stack), self.data_stack, self.frames[TF])
+        return self.op_return(args, ip)
+
+    def op_tail_jump(self, args, ip):
+        return args[0]
+
+    def op_tail_call(self, args, ip):
+        if not self.local_frames:
+            self.runtime.call_stack.append(ip)
+            return args[0]
+
+        self.local_frames.pop()
+        self.frames[LF] = self.local_frames[-1] if self.local_frames else None
+        return args[0]
@@ -7,21 +7,41 @@ class XmlParser:
     def __init__(self, stream_type: str):
         self._stream = stream_type
 
-    def parse_input(self) -> ET.Element:
-        input = ""
+    def read_source(self):
         if self._stream == "stdin":
-            input = stdin.read()
+            return stdin.buffer.read()
 
-            try:
-                root = ET.fromstring(input)
-                return root
-            except ET.ParseError:
-                exit_with_error(Error.InvalidXmlFormat)
+        try:
+            with open(self._stream, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            exit_with_error(Error.InvalidFile)
 
+    def iter_children(self):
+        if self._stream == "stdin":
+            source = stdin.buffer
         else:
-            try:
-                return ET.parse(self._stream).getroot()
-            except ET.ParseError:
-                exit_with_error(Error.InvalidXmlFormat)
-            except FileNotFoundError:
-                exit_with_error(Error.InvalidFile)
+            source = self._stream
+
+        root = None
+        depth = 0
+
+        try:
+            for event, element in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = element
+                    depth += 1
+                    continue
+
+                depth -= 1
+                if depth == 1:
+                    yield element
+                    # Drop the finished child so only the decoded
+                    # instructions outlive the parse.
+                    root.clear()
+
+        except ET.ParseError:
+            exit_with_error(Error.InvalidXmlFormat)
+        except FileNotFoundError:
+            exit_with_error(Error.InvalidFile)